@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+from typing import Dict, List, Optional
+import secrets
+
+import config
+from services.profiling import PROFILER_CPROFILE, profile_store, summarize
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Check the admin token; without a configured token every request is refused"""
+    if not config.ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _get_profile(profile_id: int) -> Dict:
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return record
+
+
+@router.get("/profiles")
+def list_profiles() -> List[Dict]:
+    """Recent request profiles, newest first"""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: int):
+    """Raw profile: folded stacks for the sampler, a pstats file for cProfile"""
+    record = _get_profile(profile_id)
+    extension = "pstats" if record["profiler"] == PROFILER_CPROFILE else "folded"
+    return Response(content=record["data"], media_type=record["media_type"], headers={
+        "Content-Disposition": f'attachment; filename="profile-{profile_id}.{extension}"'
+    })
+
+
+@router.get("/profiles/{profile_id}/summary", response_class=PlainTextResponse)
+def profile_summary(profile_id: int):
+    """Top functions by cumulative time (cProfile) or hottest stacks (sampler)"""
+    record = _get_profile(profile_id)
+    if record["profiler"] == PROFILER_CPROFILE:
+        return summarize(record)
+    return b"\n".join(record["data"].splitlines()[:30]).decode("utf-8")
@@ -1,152 +1,250 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from models.game import (
-    ScanBugRequest, ScanBugResponse, UpdateStatsRequest, 
-    PlayerStats, LeaderboardEntry, PortalResponse, CodeSnippetResponse, CodeSnippet,
+    ScanBugRequest, ScanBugResponse, ScanBatchRequest, ScanBatchResponse, UpdateStatsRequest, 
+    LeaderboardEntry, PortalResponse, CodeSnippetResponse,
     StartGameRequest, StartGameResponse, CompilerScanResponse
 )
-from services.game_state import game_state
+from services.game_state import GameState, SCAN_MODE_ANALYTIC, detection_chance
+from services.state_backend import state_backend
+from services.routing import new_game_id
+from services.scan_scheduler import scan_scheduler
+from services.scan_stream import scan_events
+from services.snippet_store import snippet_store
+from services.layout_pool import layout_pool
+from services.leaderboard import leaderboard, stat_row
+from services.stats_writer import stats_writer
+from services.metrics import SCAN_PROBES, registry
+from services.fast_json import json_response, scan_response_payload
 from services.exit_portals import get_random_exit_portal
+import config
 import json
 import random
 import os
 import asyncio
-import threading
+import queue
 import time
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Dict, List, Optional, TypeVar
 
 router = APIRouter()
 
-# Background task to move compiler scan
-def compiler_scan_loop():
-    """Background loop to automatically move the compiler scan"""
-    while True:
-        if game_state.compiler_scan_active:
-            game_state.update_compiler_scan()
-        time.sleep(0.5)  # Check every 0.5 seconds
+T = TypeVar("T")
 
-# Start the background task
-scan_thread = threading.Thread(target=compiler_scan_loop, daemon=True)
-scan_thread.start()
+
+async def in_session(game_id: str, fn: Callable[[GameState], T], write: bool = True) -> T:
+    """Run fn(state) on a running game (see StateBackend.run) or fail with 404"""
+    def checked(state: Optional[GameState]) -> T:
+        if state is None:
+            raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+        return fn(state)
+    return await state_backend.run(game_id, checked, write)
+
+def schedule_scan(state: GameState) -> None:
+    """Hand a freshly started game to the scan scheduler"""
+    if state.scan_mode == SCAN_MODE_ANALYTIC:
+        return  # the position is computed on read, nothing to tick
+    scan_scheduler.schedule(state.current_game_id, state.next_scan_time)
+
+def splice_json_response(payload: Dict, key: str, fragment: bytes) -> Response:
+    """Encode a small payload and append an already encoded JSON value under `key`"""
+    head = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    body = b"".join((head[:-1], b',"', key.encode("utf-8"), b'":', fragment, b"}"))
+    return Response(content=body, media_type="application/json")
 
 @router.get("/test")
-def test_endpoint():
+async def test_endpoint():
     """Test endpoint to verify API is working"""
     return {"message": "Game API is working!", "endpoints": [
         "POST /api/start-game",
         "POST /api/start-simple-game", 
         "GET /api/compiler-scan-status",
+        "GET /api/compiler-scan-stream",
         "POST /api/scan-bug-position",
-        "GET /api/exit-portal"
+        "POST /api/scan-bug-position/batch",
+        "GET /api/exit-portal",
+        "GET /api/snippets/{snippet_id}",
+        "GET /api/metrics"
     ]}
 
+# Gauges read at scrape time
+registry.gauge("bug_ide_active_sessions", "Games currently held in the state backend", lambda: len(state_backend))
+registry.gauge("bug_ide_leaderboard_size", "Player stats stored in the leaderboard", lambda: leaderboard.count())
+registry.gauge("bug_ide_scan_scheduler_last_lag_seconds", "Lag of the most recent scheduled scan step",
+               lambda: scan_scheduler.last_lag)
+registry.gauge("bug_ide_scan_scheduler_pending", "Scan deadlines waiting in the scheduler heap",
+               lambda: scan_scheduler.pending)
+registry.gauge("bug_ide_layout_pool_depth", "Pre-generated game layouts ready across all snippets",
+               lambda: layout_pool.depth)
+registry.gauge("bug_ide_layout_pool_hit_rate", "Share of game starts served from a pre-generated layout",
+               lambda: layout_pool.stats()["hit_rate"])
+registry.gauge("bug_ide_layout_pool_generated", "Layouts built by the refill thread and warm-up fills",
+               lambda: layout_pool.generated_total)
+registry.gauge("bug_ide_stats_queue_depth", "Player stats waiting to be written",
+               lambda: stats_writer.stats()["queue_depth"])
+registry.gauge("bug_ide_stats_dropped_rows", "Player stats dropped after the leaderboard write kept failing",
+               lambda: stats_writer.dropped_total)
+
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus-style metrics"""
+    # Some gauges query SQLite
+    return Response(content=await run_in_threadpool(registry.render), media_type="text/plain; version=0.0.4")
+
 @router.post("/start-game", response_model=StartGameResponse)
-def start_game(request: StartGameRequest):
+async def start_game(request: StartGameRequest):
     """Start a new game with compiler scan"""
     try:
         # Get a random code snippet
-        with open(os.path.join("static", "snippets.json"), "r") as f:
-            snippets = json.load(f)
-        
-        snippet = random.choice(snippets)
-        code_snippet_response = CodeSnippetResponse(
-            lines=snippet["lines"],
-            language=snippet["language"],
-            filename=snippet["filename"],
-            total_lines=len(snippet["lines"])
-        )
-        
-        # Start the game
-        game_id = game_state.start_new_game(
+        await snippet_store.refresh()
+        try:
+            snippet = snippet_store.random(request.language)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0]))
+        # Start the game in its own session on a pre-generated layout
+        layout = layout_pool.pop(snippet)
+        state = await state_backend.create_async(
             player_name=request.player_name,
-            code_snippet=snippet,
-            difficulty=request.difficulty
+            code_snippet=snippet.data,
+            difficulty=request.difficulty,
+            bug_position=layout.bug_position,
+            fake_errors=layout.fake_errors
         )
+        schedule_scan(state)
         
-        return StartGameResponse(
-            success=True,
-            game_id=game_id,
-            message=f"Game started for {request.player_name}!",
-            code_snippet=code_snippet_response,
-            compiler_scan_position=game_state.compiler_scan_position,
-            scan_speed=game_state.scan_speed
-        )
+        # Same shape as StartGameResponse, with the pre-encoded snippet spliced in
+        return splice_json_response({
+            "success": True,
+            "game_id": state.current_game_id,
+            "message": f"Game started for {request.player_name}!",
+            "compiler_scan_position": state.compiler_scan_position,
+            "scan_speed": state.scan_speed,
+            "snippet_id": snippet.content_id
+        }, "code_snippet", snippet.json_body)
         
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Code snippets file not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting game: {str(e)}")
 
 @router.get("/init-game")
-def init_game():
+async def init_game():
     """Initialize a basic game - GET endpoint for easy testing"""
     try:
         # Simple game initialization
-        game_state.reset_game()
+        state = GameState()
+        state.current_game_id = new_game_id()
+        state.game_start_time = time.time()
         
         # Set a test bug position
-        game_state.set_bug_position(5, 10)  # Closer bug for faster testing
+        state.set_bug_position(5, 10)  # Closer bug for faster testing
         
         # Start compiler scan with faster speed for testing
-        game_state.compiler_scan_active = True
-        game_state.compiler_scan_position = {"line": 1, "column": 1}
-        game_state.scan_speed = 0.5  # Move every 0.5 seconds for visible movement
-        game_state.max_columns_per_line = 20  # Shorter lines for faster testing
-        game_state.total_lines = 10  # Limited lines for testing
-        game_state.last_scan_time = time.time()
+        state.compiler_scan_active = True
+        state.compiler_scan_position = {"line": 1, "column": 1}
+        state.scan_speed = 0.5  # Move every 0.5 seconds for visible movement
+        state.max_columns_per_line = 20  # Shorter lines for faster testing
+        state.total_lines = 10  # Limited lines for testing
+        state.last_scan_time = time.time()
+        await state_backend.add_async(state)
+        schedule_scan(state)
         
         return {
             "success": True,
+            "game_id": state.current_game_id,
             "message": "Game initialized! Compiler scan will move every 0.5 seconds.",
-            "bug_position": game_state.get_bug_position(),
-            "compiler_scan_position": game_state.compiler_scan_position,
-            "scan_speed": game_state.scan_speed,
+            "bug_position": state.get_bug_position(),
+            "compiler_scan_position": state.compiler_scan_position,
+            "scan_speed": state.scan_speed,
             "instructions": "Watch the scan position change in /api/compiler-scan-status or use POST /api/scan-bug-position to search"
         }
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 @router.post("/start-simple-game")
-def start_simple_game():
+async def start_simple_game():
     """Simple game start endpoint for testing"""
     try:
         # Get a random code snippet  
-        with open(os.path.join("static", "snippets.json"), "r") as f:
-            snippets = json.load(f)
-        
-        snippet = random.choice(snippets)
+        await snippet_store.refresh()
+        snippet = snippet_store.random()
         
         # Start the game with default player
-        game_id = game_state.start_new_game(
+        layout = layout_pool.pop(snippet)
+        state = await state_backend.create_async(
             player_name="Player1",
-            code_snippet=snippet,
-            difficulty="medium"
+            code_snippet=snippet.data,
+            difficulty="medium",
+            bug_position=layout.bug_position,
+            fake_errors=layout.fake_errors
         )
+        schedule_scan(state)
         
         return {
             "success": True,
-            "game_id": game_id,
+            "game_id": state.current_game_id,
             "message": "Game started!",
-            "code_lines": snippet["lines"],
-            "language": snippet["language"],
-            "filename": snippet["filename"],
-            "bug_position": game_state.get_bug_position(),
-            "compiler_scan_position": game_state.compiler_scan_position,
-            "scan_speed": game_state.scan_speed
+            "code_lines": snippet.lines,
+            "language": snippet.language,
+            "filename": snippet.filename,
+            "bug_position": state.get_bug_position(),
+            "compiler_scan_position": state.compiler_scan_position,
+            "scan_speed": state.scan_speed
         }
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@router.get("/snippets/{snippet_id}", response_model=CodeSnippetResponse)
+async def get_snippet(snippet_id: str, request: Request):
+    """Serve a snippet by content id; the body never changes, so clients may cache it forever"""
+    await snippet_store.refresh()
+    snippet = snippet_store.get_by_content_id(snippet_id)
+    if snippet is None:
+        raise HTTPException(status_code=404, detail=f"Snippet {snippet_id} not found")
+    
+    headers = {
+        "ETag": snippet.etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding"
+    }
+    if snippet.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if snippet.brotli_body is not None and "br" in accept_encoding:
+        headers["Content-Encoding"] = "br"
+        return Response(content=snippet.brotli_body, media_type="application/json", headers=headers)
+    if "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snippet.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snippet.json_body, media_type="application/json", headers=headers)
+
 @router.get("/compiler-scan-status", response_model=CompilerScanResponse)
-def get_compiler_scan_status():
+async def get_compiler_scan_status(game_id: str):
     """Get current compiler scan status and update position"""
-    status = game_state.update_compiler_scan()
+    # Reads work on a copy in shared backends; the owner's scheduler persists the clock
+    status = await in_session(game_id, GameState.update_compiler_scan, write=False)
+    if config.FAST_JSON:
+        return json_response(scan_response_payload(status))
     return CompilerScanResponse(**status)
 
+@router.get("/compiler-scan-stream")
+async def stream_compiler_scan(game_id: str, request: Request):
+    """Push compiler scan updates as Server-Sent Events instead of polling"""
+    await in_session(game_id, lambda state: None, write=False)  # 404 before the stream starts
+    return StreamingResponse(
+        scan_events(state_backend, game_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/stop-game")
-def stop_game():
-    """Stop the current game (when player finds bug or uses portal)"""
-    game_state.stop_compiler_scan()
+async def stop_game(game_id: str):
+    """Stop the game (when player finds bug or uses portal)"""
+    await in_session(game_id, GameState.stop_compiler_scan)
     return {"message": "Game stopped", "success": True}
 def generate_code():
     """Returns a random fake code snippet with lines array"""
@@ -168,66 +266,133 @@ def generate_code():
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Code snippets file not found")
 
+def probe_response(hit: bool, message: str):
+    """Probe result, encoded directly when the fast JSON path is on"""
+    if config.FAST_JSON:
+        return json_response({"hit": hit, "message": message})
+    return ScanBugResponse(hit=hit, message=message)
+
 @router.post("/scan-bug-position", response_model=ScanBugResponse)
-def scan_bug_position(request: ScanBugRequest):
+async def scan_bug_position(request: ScanBugRequest):
     """Checks if the bug is hidden at the scanned position"""
-    # Check if it's an exact hit
-    if game_state.is_exact_bug_position(request.line, request.column):
-        # Player found the bug! Stop the compiler scan
-        game_state.stop_compiler_scan()
-        return ScanBugResponse(hit=True, message="Direct hit! Bug found! You escaped the compiler!")
+    def probe(state: GameState):
+        # Check if it's an exact hit
+        if state.is_exact_bug_position(request.line, request.column):
+            # Player found the bug! Stop the compiler scan
+            state.stop_compiler_scan()
+            return "hit", 0
+        # Check if it's near the bug, and for interference from nearby fake errors
+        if state.is_position_near_bug(request.line, request.column):
+            return "near", state.count_nearby_fake_errors(request.line, request.column)
+        return "miss", 0
     
-    # Check if it's near the bug
-    if game_state.is_position_near_bug(request.line, request.column):
-        # Check for interference from nearby fake errors
-        nearby_fake_errors = game_state.get_nearby_fake_errors(request.line, request.column)
-        
+    result, nearby_fake_errors = await in_session(request.game_id, probe)
+    if result == "hit":
+        SCAN_PROBES.inc(1, "hit")
+        return probe_response(hit=True, message="Direct hit! Bug found! You escaped the compiler!")
+    
+    if result == "near":
+        SCAN_PROBES.inc(1, "near")
         # More fake errors nearby = lower chance of detection
-        interference_factor = len(nearby_fake_errors) * 0.1
-        detection_chance = max(0.3, 0.6 - interference_factor)
-        
-        if random.random() < detection_chance:
-            return ScanBugResponse(hit=True, message="Bug detected nearby! Keep searching...")
+        if random.random() < detection_chance(nearby_fake_errors):
+            return probe_response(hit=True, message="Bug detected nearby! Keep searching...")
         else:
-            return ScanBugResponse(hit=False, message="Something's not right here...")
+            return probe_response(hit=False, message="Something's not right here...")
     
     # Far miss
-    return ScanBugResponse(hit=False, message="No bug detected at this location")
+    SCAN_PROBES.inc(1, "miss")
+    return probe_response(hit=False, message="No bug detected at this location")
+
+_PROBE_MESSAGES = {
+    "hit": "Direct hit! Bug found! You escaped the compiler!",
+    "miss": "No bug detected at this location",
+    "late": "Too late, the game was already over"
+}
+
+@router.post("/scan-bug-position/batch", response_model=ScanBatchResponse)
+async def scan_bug_positions(request: ScanBatchRequest):
+    """Checks many probes in one round trip, replayed in client-time order"""
+    if len(request.probes) > config.MAX_PROBES_PER_BATCH:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {config.MAX_PROBES_PER_BATCH} probes per batch")
+    probes = [(probe.line, probe.column, probe.client_time) for probe in request.probes]
+    outcomes, game_active = await in_session(
+        request.game_id, lambda state: (state.evaluate_probes(probes), state.compiler_scan_active))
+    
+    results = []
+    for (line, column, _), (result, nearby_fake_errors) in zip(probes, outcomes):
+        SCAN_PROBES.inc(1, result)
+        if result == "near":
+            # Same odds as a single probe: nearby fake errors interfere with detection
+            hit = random.random() < detection_chance(nearby_fake_errors)
+            message = "Bug detected nearby! Keep searching..." if hit else "Something's not right here..."
+        else:
+            hit = result == "hit"
+            message = _PROBE_MESSAGES[result]
+        results.append({"line": line, "column": column, "hit": hit, "result": result, "message": message})
+    
+    payload = {"results": results, "game_active": game_active}
+    return json_response(payload) if config.FAST_JSON else payload
 
 @router.post("/update-stats")
-def update_stats(request: UpdateStatsRequest):
-    """Stores player stats in memory"""
-    player_stat = PlayerStats(
-        player_name=request.player_name,
-        time_survived=request.time_survived,
-        status=request.status,
-        bug_location=request.bug_location
-    )
-    game_state.add_player_stats(player_stat)
+async def update_stats(request: UpdateStatsRequest):
+    """Queues player stats for the leaderboard"""
+    submit_stats([stat_row(request)])
     return {"message": "Stats updated successfully"}
 
+@router.post("/update-stats/bulk")
+async def update_stats_bulk(requests: List[UpdateStatsRequest]):
+    """Queues many players' stats at once, e.g. at the end of a tournament round"""
+    now = time.time()
+    accepted = submit_stats([stat_row(request, created_at=now) for request in requests])
+    return {"message": "Stats updated successfully", "accepted": accepted}
+
+@router.get("/update-stats/queue")
+async def get_stats_queue():
+    """Write-behind queue depth and flush counters"""
+    return stats_writer.stats()
+
+def submit_stats(rows: List) -> int:
+    """Hand rows to the write-behind buffer, all or none, shedding load when it is full (never blocks)"""
+    try:
+        return stats_writer.submit(rows)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Stats queue is full, retry later",
+                            headers={"Retry-After": "1"})
+
 @router.get("/game-stats")
-def get_game_stats():
-    """Get current game statistics"""
-    return {
-        "time_survived": game_state.get_time_survived(),
-        "bug_position": game_state.get_bug_position(),
-        "compiler_scan_position": game_state.compiler_scan_position,
-        "game_active": game_state.compiler_scan_active,
-        "fake_errors_count": len(game_state.get_fake_errors())
-    }
+async def get_game_stats(game_id: str):
+    """Get statistics for one game"""
+    stats = await in_session(game_id, lambda state: {
+        "time_survived": state.get_time_survived(),
+        "bug_position": state.get_bug_position(),
+        "compiler_scan_position": state.compiler_scan_position,
+        "game_active": state.compiler_scan_active,
+        "fake_errors_count": state.get_fake_error_count()
+    }, write=False)
+    return json_response(stats) if config.FAST_JSON else stats
 
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
-def get_leaderboard():
-    """Returns top 5 players with longest survival time"""
-    return game_state.get_leaderboard(limit=5)
+async def get_leaderboard(limit: int = 5, difficulty: Optional[str] = None, window: str = "all"):
+    """Returns the players with longest survival time (all-time, daily or weekly)"""
+    try:
+        # Cached boards are served from memory, but a miss reads SQLite
+        return await run_in_threadpool(leaderboard.get_leaderboard, limit=limit, difficulty=difficulty, window=window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/exit-portal", response_model=PortalResponse)
-def get_exit_portal():
-    """Returns a random portal location with line number and clue"""
+async def get_exit_portal(game_id: Optional[str] = None):
+    """Returns a random portal location with line number and clue (one that fits the game's snippet)"""
     try:
+        line_count = None
+        if game_id is not None:
+            line_count = await in_session(game_id, lambda state: state.total_lines, write=False)
+        
         # Get a random portal from the exit_portals service
-        portal_data = get_random_exit_portal()
+        portal_data = get_random_exit_portal(line_count)
+        if portal_data is None:
+            raise HTTPException(status_code=404, detail="No exit portal fits this code snippet")
         
         # Return using the PortalResponse model
         return PortalResponse(
@@ -237,5 +402,7 @@ def get_exit_portal():
             y=random.randint(50, 400),  # Random y coordinate for visual positioning
             description=f"Exit Portal at line {portal_data['line']}: {portal_data['clue']}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating exit portal: {str(e)}")
@@ -0,0 +1,96 @@
+"""Cold-start budget: import time of the app and time to finish startup.
+
+Each run is a fresh interpreter started with `-X importtime` that imports
+`main` and runs the FastAPI lifespan startup. The median over the runs is
+checked against the budgets and the script exits non-zero when one is
+exceeded, so it can gate CI. Run from the backend directory:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 9 --budget-ms 80 --startup-budget-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PARTY = ("main", "config", "api", "models", "services")
+
+_CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+ready = asyncio.run(startup())
+print(json.dumps({"import_ms": (imported - started) * 1e3, "startup_ms": (ready - started) * 1e3}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for every `-X importtime` line"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            modules.append((name, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure_once() -> Dict:
+    env = dict(os.environ, BUG_IDE_LEADERBOARD_DB=":memory:", BUG_IDE_LOG_LEVEL="WARNING")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD], cwd=BACKEND_DIR,
+                               env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(completed.stderr)
+    first_party = [(name, self_us) for name, self_us, _ in modules if name.split(".")[0] in FIRST_PARTY]
+    result["first_party_ms"] = sum(self_us for _, self_us in first_party) / 1e3
+    result["first_party_modules"] = first_party
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time and startup budget for the backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=100.0,
+                        help="budget for the app's own modules (self time, excluding dependencies)")
+    parser.add_argument("--startup-budget-ms", type=float, default=1500.0,
+                        help="budget for importing main and completing lifespan startup")
+    parser.add_argument("--top", type=int, default=8, help="slowest first-party modules to list")
+    parser.add_argument("--json", help="write the medians to this file")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    summary = {key: statistics.median(result[key] for result in runs)
+               for key in ("first_party_ms", "import_ms", "startup_ms")}
+
+    print(f"{'first-party import':<20}{summary['first_party_ms']:>9.1f} ms  (budget {args.budget_ms:.0f})")
+    print(f"{'import main':<20}{summary['import_ms']:>9.1f} ms")
+    print(f"{'startup complete':<20}{summary['startup_ms']:>9.1f} ms  (budget {args.startup_budget_ms:.0f})")
+    print("slowest first-party modules (last run, self time):")
+    for name, self_us in sorted(runs[-1]["first_party_modules"], key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<32}{self_us / 1e3:>7.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    over = []
+    if summary["first_party_ms"] > args.budget_ms:
+        over.append("first-party import")
+    if summary["startup_ms"] > args.startup_budget_ms:
+        over.append("startup")
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
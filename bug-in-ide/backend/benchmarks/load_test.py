@@ -0,0 +1,299 @@
+"""Load test for the game API.
+
+Drives a weighted mix of start-game, scan-bug-position, compiler-scan-status,
+update-stats and leaderboard requests from concurrent virtual players and
+reports latency percentiles, throughput and server RSS. Run from the backend
+directory:
+
+    python -m benchmarks.load_test                        # in-process ASGI app
+    python -m benchmarks.load_test --uvicorn              # spawn a uvicorn server
+    python -m benchmarks.load_test --url http://host:8000 # existing server
+
+Results are written as JSON (benchmarks/results/ by default) so runs on
+different commits can be compared with --compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+DEFAULT_MIX = "start=1,scan=20,status=20,stats=2,leaderboard=2"
+OPERATIONS = ("start", "scan", "status", "stats", "leaderboard")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse "start=1,scan=20,..." into operation weights"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}, expected one of {OPERATIONS}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of a process (this one by default)"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid is None:
+        # ru_maxrss is KiB on Linux, bytes on macOS; peak rather than current
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return 0
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Player:
+    """A virtual client that keeps one game going and issues the request mix"""
+
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], rng: random.Random):
+        self.client = client
+        self.rng = rng
+        self.operations = list(mix)
+        self.weights = [mix[op] for op in self.operations]
+        self.game_id: Optional[str] = None
+        self.lines = 40
+
+    async def request(self, operation: str) -> httpx.Response:
+        if operation == "start" or self.game_id is None:
+            response = await self.client.post("/api/start-game", json={
+                "player_name": f"bench-{self.rng.randrange(10**6)}",
+                "difficulty": self.rng.choice(("easy", "medium", "hard"))
+            })
+            if response.status_code == 200:
+                body = response.json()
+                self.game_id = body["game_id"]
+                self.lines = body["code_snippet"]["total_lines"]
+            return response
+        if operation == "scan":
+            return await self.client.post("/api/scan-bug-position", json={
+                "game_id": self.game_id,
+                "line": self.rng.randint(1, self.lines),
+                "column": self.rng.randint(1, 60)
+            })
+        if operation == "status":
+            return await self.client.get("/api/compiler-scan-status", params={"game_id": self.game_id})
+        if operation == "stats":
+            return await self.client.post("/api/update-stats", json={
+                "player_name": f"bench-{self.rng.randrange(10**6)}",
+                "time_survived": self.rng.uniform(1, 300),
+                "status": self.rng.choice(("escaped", "caught")),
+                "bug_location": {"line": 1, "column": 1}
+            })
+        return await self.client.get("/api/leaderboard")
+
+    def next_operation(self) -> str:
+        if self.game_id is None:
+            return "start"
+        return self.rng.choices(self.operations, self.weights)[0]
+
+
+async def run_load(client: httpx.AsyncClient, mix: Dict[str, float], concurrency: int,
+                   duration: float, warmup: float, seed: int) -> Dict:
+    """Run the virtual players and collect per-operation latencies"""
+    latencies: Dict[str, List[float]] = {op: [] for op in OPERATIONS}
+    errors: Dict[str, int] = {op: 0 for op in OPERATIONS}
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def player_loop(index: int) -> None:
+        player = Player(client, mix, random.Random(seed + index))
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            operation = player.next_operation()
+            begin = time.perf_counter()
+            try:
+                response = await player.request(operation)
+                ok = response.status_code < 400
+                if response.status_code == 404:
+                    player.game_id = None  # session evicted, start over
+            except httpx.HTTPError:
+                ok = False
+            end = time.perf_counter()
+            if begin >= measure_from:
+                latencies[operation].append(end - begin)
+                if not ok:
+                    errors[operation] += 1
+
+    await asyncio.gather(*(player_loop(i) for i in range(concurrency)))
+
+    report = {}
+    total = 0
+    for operation in OPERATIONS:
+        values = sorted(latencies[operation])
+        total += len(values)
+        if not values:
+            continue
+        report[operation] = {
+            "count": len(values),
+            "errors": errors[operation],
+            "throughput_rps": len(values) / duration,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000
+        }
+    return {"operations": report, "total_requests": total, "throughput_rps": total / duration}
+
+
+@asynccontextmanager
+async def in_process_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Client calling the ASGI app directly, with its lifespan running"""
+    from main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+@asynccontextmanager
+async def uvicorn_client(port: int, workers: int) -> AsyncIterator[httpx.AsyncClient]:
+    """Spawn uvicorn on `port` and connect to it"""
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+               "--log-level", "warning", "--workers", str(workers)]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}",
+                                     limits=httpx.Limits(max_connections=None)) as client:
+            for _ in range(100):
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                try:
+                    await client.get("/api/")
+                    break
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start within 10 seconds")
+            client.server_pid = server.pid
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@asynccontextmanager
+async def remote_client(url: str) -> AsyncIterator[httpx.AsyncClient]:
+    async with httpx.AsyncClient(base_url=url, limits=httpx.Limits(max_connections=None)) as client:
+        yield client
+
+
+def compare(current: Dict, previous_path: str) -> None:
+    """Print latency/throughput changes against an earlier result file"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous_path} (commit {previous.get('commit')}):")
+    for operation, now in current["operations"].items():
+        before = previous.get("operations", {}).get(operation)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if before[key]:
+                changes.append(f"{key} {100 * (now[key] - before[key]) / before[key]:+.1f}%")
+        print(f"  {operation:<12} " + "  ".join(changes))
+
+
+def print_report(result: Dict) -> None:
+    print(f"{result['mode']} | concurrency {result['concurrency']} | {result['duration_s']}s "
+          f"| {result['throughput_rps']:.0f} req/s | server RSS {result['rss_bytes'] / 1e6:.1f} MB")
+    print(f"  {'operation':<12} {'count':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for operation, stats in result["operations"].items():
+        print(f"  {operation:<12} {stats['count']:>8} {stats['errors']:>6} {stats['throughput_rps']:>8.0f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+async def main_async(args: argparse.Namespace) -> Dict:
+    mix = parse_mix(args.mix)
+    if args.url:
+        mode, factory = "remote", remote_client(args.url)
+    elif args.uvicorn:
+        mode, factory = "uvicorn", uvicorn_client(args.port, args.workers)
+    else:
+        mode, factory = "in-process", in_process_client()
+
+    async with factory as client:
+        result = await run_load(client, mix, args.concurrency, args.duration, args.warmup, args.seed)
+        pid = getattr(client, "server_pid", None)
+        result["rss_bytes"] = rss_bytes(pid) if mode != "remote" else 0
+
+    result.update({
+        "mode": mode,
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "mix": mix,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration
+    })
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test for the game API")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--uvicorn", action="store_true", help="spawn a uvicorn server instead of calling the app in-process")
+    target.add_argument("--url", help="benchmark an already running server")
+    parser.add_argument("--port", type=int, default=8765, help="port for --uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --uvicorn")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual players")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<commit>-<mode>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    print_report(result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}-{result['mode']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Micro-benchmarks for GameState hot paths.
+
+Each case is parameterised by snippet size and/or fake-error count, in the
+spirit of pytest-benchmark but with no dependency beyond the app itself.
+Run from the backend directory:
+
+    python -m benchmarks.micro                 # every case
+    python -m benchmarks.micro -k nearby       # cases whose name contains "nearby"
+    python -m benchmarks.micro --max-stats 1000000 --json micro.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+import time
+import timeit
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from services.game_state import GameState, SCAN_MODE_ANALYTIC, SCAN_MODE_TICKED
+from services.leaderboard import Leaderboard
+from services.snippet_store import SnippetStore
+
+SNIPPET_SIZES = (30, 300, 3000)  # lines
+FAKE_ERROR_COUNTS = (10, 1_000, 10_000)
+STATS_COUNTS = (1_000, 10_000, 100_000, 1_000_000)
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def make_snippet(lines: int, seed: int = 0) -> Dict:
+    """A synthetic snippet of `lines` code-like lines"""
+    rng = random.Random(seed)
+    words = ("const", "value", "return", "if", "for", "user", "data", "=", "(", ")", "{", "}", ";")
+    return {
+        "language": "javascript",
+        "filename": f"bench-{lines}.js",
+        "lines": ["  " * rng.randint(0, 3) + " ".join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+                  for _ in range(lines)]
+    }
+
+
+def started_game(lines: int, fake_errors: int, scan_mode: str = SCAN_MODE_TICKED) -> GameState:
+    state = GameState(scan_mode)
+    state.start_new_game("bench", make_snippet(lines), "medium")
+    bug = state.bug_position
+    state.set_bug_position(bug["line"], bug["column"], fake_error_count=fake_errors)
+    return state
+
+
+def start_game_cases() -> Iterator[Case]:
+    for lines in SNIPPET_SIZES:
+        snippet = make_snippet(lines)
+        yield f"start_new_game[lines={lines}]", lambda snippet=snippet: GameState().start_new_game("bench", snippet)
+
+
+def scan_cases() -> Iterator[Case]:
+    for lines in SNIPPET_SIZES:
+        ticked = started_game(lines, 10)
+        ticked.set_bug_position(lines, 1, fake_error_count=10)
+
+        def one_step(state=ticked):
+            # Make exactly one step due so every call measures a real advance
+            state.last_scan_time = time.time() - state.scan_speed
+            state.update_compiler_scan()
+            if not state._scan_active:
+                state.compiler_scan_position = {"line": 1, "column": 1}
+                state.compiler_scan_active = True
+        yield f"update_compiler_scan[ticked,lines={lines}]", one_step
+
+        analytic = started_game(lines, 10, SCAN_MODE_ANALYTIC)
+        yield f"update_compiler_scan[analytic,lines={lines}]", analytic.update_compiler_scan
+
+        idle = started_game(lines, 10)
+        yield f"_get_scan_status[ticked,lines={lines}]", idle._get_scan_status
+        yield f"_get_scan_status[analytic,lines={lines}]", analytic._get_scan_status
+
+
+def nearby_cases() -> Iterator[Case]:
+    for count in FAKE_ERROR_COUNTS:
+        state = started_game(300, count)
+        bug = state.bug_position
+        line, column = bug["line"] + 1, bug["column"] + 1
+        yield f"get_nearby_fake_errors[errors={count}]", lambda s=state, l=line, c=column: s.get_nearby_fake_errors(l, c)
+        yield f"count_nearby_fake_errors[errors={count}]", lambda s=state, l=line, c=column: s.count_nearby_fake_errors(l, c)
+        yield f"set_bug_position[errors={count}]", lambda s=state, n=count: s.set_bug_position(10, 10, fake_error_count=n)
+
+
+def probe_cases() -> Iterator[Case]:
+    for count in FAKE_ERROR_COUNTS:
+        state = started_game(300, count)
+        bug = state.bug_position
+        rng = random.Random(count)
+        # Near and far probes, none on the bug itself so the game keeps running
+        probes = [(bug["line"] + rng.randint(-3, 3), bug["column"] + rng.randint(1, 8), None) for _ in range(50)]
+        probes += [(rng.randint(1, 300), rng.randint(1, 80), None) for _ in range(50)]
+
+        def one_by_one(s=state, probes=probes):
+            # What 100 calls to POST /api/scan-bug-position do, minus the HTTP round trips
+            for line, column, _ in probes:
+                if not s.is_exact_bug_position(line, column) and s.is_position_near_bug(line, column):
+                    s.count_nearby_fake_errors(line, column)
+        yield f"probes x100 one by one[errors={count}]", one_by_one
+        yield f"evaluate_probes x100[errors={count}]", lambda s=state, p=probes: s.evaluate_probes(p)
+
+
+def leaderboard_cases(max_stats: int) -> Iterator[Case]:
+    rng = random.Random(0)
+    now = time.time()
+    for count in STATS_COUNTS:
+        if count > max_stats:
+            continue
+        board = Leaderboard(":memory:", top_k=100)
+        board.add_rows((f"p{i}", rng.uniform(0, 1000), "caught", 1, 1,
+                        rng.choice(("easy", "medium", "hard")), now - rng.uniform(0, 14 * 86400))
+                       for i in range(count))
+        board.get_leaderboard(5)
+        yield f"get_leaderboard[stats={count},warm]", lambda b=board: b.get_leaderboard(5)
+
+        def cold(b=board):
+            b._boards.clear()  # force the indexed SQLite query
+            return b.get_leaderboard(5, difficulty="hard", window="weekly")
+        yield f"get_leaderboard[stats={count},cold]", cold
+
+        row = ("new", 500.0, "caught", 1, 1, "medium", now)
+        yield f"add_rows[stats={count}]", lambda b=board, r=row: b.add_rows([r])
+
+
+def snippet_cases(workdir: str) -> Iterator[Case]:
+    for lines in SNIPPET_SIZES:
+        path = os.path.join(workdir, f"snippets-{lines}.json")
+        with open(path, "w") as f:
+            json.dump([make_snippet(lines, seed) for seed in range(10)], f)
+        store = SnippetStore(path, reload_interval=3600)
+        store.load()
+        yield f"snippet_store.load[lines={lines}]", store.load
+        yield f"snippet_store.random[lines={lines}]", store.random
+
+        def load_per_request(path=path):
+            # What start_game did before the snippet store: parse the file on every call
+            with open(path) as f:
+                return random.choice(json.load(f))
+        yield f"json.load per request[lines={lines}]", load_per_request
+
+
+def time_case(func: Callable[[], object], min_time: float) -> Dict:
+    """Best-of-5 mean time per call, with the loop count picked like timeit's autorange"""
+    timer = timeit.Timer(func)
+    # Keep anything the code under test prints out of the measurement output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        number = 1
+        while timer.timeit(number) < min_time / 5:
+            number *= 2
+        runs = [timer.timeit(number) / number for _ in range(5)]
+    return {"best_s": min(runs), "median_s": sorted(runs)[2], "loops": number}
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.0f} ns"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GameState micro-benchmarks")
+    parser.add_argument("-k", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend per case")
+    parser.add_argument("--max-stats", type=int, default=100_000, help="largest leaderboard size to build")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        groups = (start_game_cases(), scan_cases(), nearby_cases(), probe_cases(),
+                  leaderboard_cases(args.max_stats), snippet_cases(workdir))
+        for group in groups:
+            for name, func in group:
+                if args.k not in name:
+                    continue
+                timing = time_case(func, args.min_time)
+                results.append({"name": name, **timing})
+                print(f"{name:<48} {format_time(timing['best_s'])}  (median {format_time(timing['median_s']).strip()})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
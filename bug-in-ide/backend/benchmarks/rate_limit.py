@@ -0,0 +1,101 @@
+"""Per-request overhead of the admission-control middleware.
+
+Wraps a no-op ASGI app in RateLimitMiddleware (budgets high enough that
+nothing is rejected) and times requests straight through it, so the
+difference from the bare app is the limiter's own work: the concurrency
+check, one or two bucket updates and, for POST routes with a per-game
+budget, peeking at the JSON body. Run from the backend directory:
+
+    python -m benchmarks.rate_limit
+    python -m benchmarks.rate_limit --requests 200000 --clients 100000 --json rate_limit.json
+"""
+import argparse
+import asyncio
+import json
+import time
+import timeit
+from typing import Dict, List
+
+from services.rate_limit import RateLimitMiddleware, TokenBuckets
+
+UNLIMITED = (1e9, 1e9)
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def make_scopes(count: int, path: str, method: str, query: bytes) -> List[Dict]:
+    """One scope per simulated client address"""
+    return [{
+        "type": "http", "method": method, "path": path, "query_string": query,
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 1),
+    } for i in range(count)]
+
+
+async def time_app(app, scopes: List[Dict], requests: int, body: bytes) -> float:
+    """Process CPU per request in microseconds"""
+    message = {"type": "http.request", "body": body, "more_body": False}
+
+    async def receive():
+        return message
+
+    async def send(message):
+        pass
+
+    started = time.process_time()
+    for i in range(requests):
+        await app(scopes[i % len(scopes)], receive, send)
+    return (time.process_time() - started) / requests * 1e6
+
+
+async def run(requests: int, clients: int) -> Dict:
+    routes = [
+        ("GET, client bucket", "/api/compiler-scan-status", "GET", b"", b""),
+        ("GET, client + game (query)", "/api/game-stats", "GET", b"game_id=0-bench", b""),
+        ("POST, client + game (JSON body)", "/api/scan-bug-position", "POST", b"",
+         json.dumps({"game_id": "0-bench", "line": 1, "column": 1}).encode()),
+    ]
+    limiter = RateLimitMiddleware(noop_app, limits={
+        "*": UNLIMITED,
+        "/api/game-stats": UNLIMITED + UNLIMITED,
+        "/api/scan-bug-position": UNLIMITED + UNLIMITED,
+    }, max_concurrent=1_000_000)
+
+    result: Dict = {"requests": requests, "clients": clients, "routes": {}}
+    for name, path, method, query, body in routes:
+        scopes = make_scopes(clients, path, method, query)
+        bare = await time_app(noop_app, scopes, requests, body)
+        limited = await time_app(limiter, scopes, requests, body)
+        result["routes"][name] = {"bare_us": bare, "limited_us": limited, "overhead_us": limited - bare}
+
+    buckets = TokenBuckets(*UNLIMITED)
+    keys = [f"client-{i}" for i in range(clients)]
+    number = 200_000
+    now = time.monotonic()
+    result["take_us"] = min(timeit.repeat(lambda: [buckets.take(key, now) for key in keys[:1000]],
+                                          number=number // 1000, repeat=5)) / number * 1e6
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Admission-control middleware overhead")
+    parser.add_argument("--requests", type=int, default=50_000, help="requests per route and mode")
+    parser.add_argument("--clients", type=int, default=1000, help="distinct client addresses")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests, args.clients))
+    print(f"{'route':<34}{'bare':>8}{'limited':>10}{'overhead':>10}  (CPU µs/request)")
+    for name, timings in result["routes"].items():
+        print(f"{name:<34}{timings['bare_us']:>8.2f}{timings['limited_us']:>10.2f}{timings['overhead_us']:>10.2f}")
+    print(f"TokenBuckets.take alone: {result['take_us']:.3f} µs")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
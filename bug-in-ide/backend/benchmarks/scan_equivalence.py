@@ -0,0 +1,140 @@
+"""Check that analytic scans end exactly where ticked scans do.
+
+Plays the same randomly generated games (snippet size, columns per line,
+bug position, difficulty and an optional early stop, all from a fixed seed)
+in both scan modes on a simulated clock. The ticked game is updated at
+random moments like a scheduler would; the analytic one is only read. At
+every moment and at the end the two must agree on the scan position,
+whether the scan is still running, whether it caught the bug and
+scan_ended_at(). Run from the backend directory:
+
+    python -m benchmarks.scan_equivalence
+    python -m benchmarks.scan_equivalence --games 2000 --seed 7
+
+Exits non-zero on the first mismatch.
+"""
+import argparse
+import random
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import services.game_state as game_state
+from services.game_state import GameState, SCAN_MODE_ANALYTIC, SCAN_MODE_TICKED, SCAN_SPEEDS
+
+
+class FakeClock:
+    """Stands in for the time module inside services.game_state"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@contextmanager
+def fake_clock(now: float) -> Iterator[FakeClock]:
+    clock = FakeClock(now)
+    real_time = game_state.time
+    game_state.time = clock
+    try:
+        yield clock
+    finally:
+        game_state.time = real_time
+
+
+def random_game(rng: random.Random) -> Dict:
+    """Parameters of one game; some bugs sit past the scanned columns or are missing"""
+    lines = rng.randint(1, 40)
+    columns = rng.randint(1, 60)
+    bug: Optional[Tuple[int, int]] = None
+    if rng.random() < 0.95:
+        bug = (rng.randint(1, lines), rng.randint(1, columns + 10))
+    return {
+        "lines": lines,
+        "columns": columns,
+        "bug": bug,
+        "difficulty": rng.choice(sorted(SCAN_SPEEDS)),
+        "stop_fraction": rng.random() if rng.random() < 0.3 else None,
+    }
+
+
+def start(params: Dict, scan_mode: str) -> GameState:
+    state = GameState(scan_mode=scan_mode)
+    state.max_columns_per_line = params["columns"]
+    snippet = {"filename": "equivalence.js", "lines": ["x"] * params["lines"]}
+    state.start_new_game("equivalence", snippet, params["difficulty"], params["bug"])
+    if params["bug"] is None:
+        state.bug_position = None  # start_new_game places one at random on a non-empty snippet
+    return state
+
+
+def observe(state: GameState) -> Tuple:
+    """Where the scan is, whether it runs and when it ended.
+
+    The status's game_over flag is left out: a ticked scan only reports it
+    from the update that ended the game, an analytic one on every read after.
+    """
+    scan = state.update_compiler_scan()["scan_status"]
+    return scan["current_line"], scan["current_column"], scan["is_active"], state.scan_ended_at()
+
+
+def caught_bug(state: GameState) -> bool:
+    bug = state.get_bug_position()
+    if bug is None:
+        return False
+    scan = state.compiler_scan_position
+    return (scan["line"], scan["column"]) >= (bug["line"], bug["column"])
+
+
+def check_game(params: Dict, rng: random.Random) -> Optional[str]:
+    """None when both modes agree, else a description of the first difference"""
+    speed = SCAN_SPEEDS[params["difficulty"]]
+    # Long enough for any scan to run off the end of the snippet
+    duration = (params["lines"] * params["columns"] + 2) * speed
+    stop_at = None if params["stop_fraction"] is None else params["stop_fraction"] * duration
+    moments: List[float] = sorted(rng.uniform(0, duration) for _ in range(rng.randint(1, 12)))
+    moments += [speed * k for k in range(1, 4)] + [duration]  # step boundaries exactly
+    moments.sort()
+
+    with fake_clock(1_000_000.0) as clock:
+        started = clock.now
+        ticked = start(params, SCAN_MODE_TICKED)
+        analytic = start(params, SCAN_MODE_ANALYTIC)
+        stopped = False
+        for moment in moments:
+            if stop_at is not None and not stopped and moment >= stop_at:
+                clock.now = started + stop_at
+                ticked.update_compiler_scan()
+                ticked.stop_compiler_scan()
+                analytic.stop_compiler_scan()
+                stopped = True
+            clock.now = started + moment
+            ticked_view, analytic_view = observe(ticked), observe(analytic)
+            if ticked_view != analytic_view:
+                return f"at t={moment:.2f}: ticked {ticked_view} != analytic {analytic_view}"
+        if caught_bug(ticked) != caught_bug(analytic):
+            return f"caught bug: ticked {caught_bug(ticked)} != analytic {caught_bug(analytic)}"
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analytic vs ticked scan equivalence")
+    parser.add_argument("--games", type=int, default=300, help="random games to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the games")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # fake-error placement inside start_new_game
+    for game in range(args.games):
+        params = random_game(rng)
+        mismatch = check_game(params, rng)
+        if mismatch is not None:
+            print(f"game {game} {params}: {mismatch}")
+            sys.exit(1)
+    print(f"{args.games} games: analytic and ticked scans agree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Per-request CPU of the pydantic response path vs the fast JSON path.
+
+Calls the ASGI app directly (no sockets, no HTTP client) so the measured
+process time is the app's own work: routing, middleware, the handler and
+response encoding. Each hot route is timed with BUG_IDE_FAST_JSON off and
+on, plus the encode step alone. Run from the backend directory:
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --requests 20000 --json serialization.json
+"""
+import argparse
+import asyncio
+import json
+import time
+import timeit
+from typing import Dict
+
+import config
+from models.game import CompilerScanResponse
+from services import fast_json
+from services.snippet_store import snippet_store
+from services.state_backend import state_backend
+
+
+async def call(app, method: str, path: str, query: bytes = b"", body: bytes = b"") -> int:
+    """One request straight through the ASGI app; returns the status code"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query,
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    received = False
+    status = 0
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def time_route(app, requests: int, method: str, path: str, query: bytes = b"", body: bytes = b"") -> float:
+    """Process CPU per request in microseconds"""
+    for _ in range(200):  # warm up
+        assert await call(app, method, path, query, body) == 200
+    started = time.process_time()
+    for _ in range(requests):
+        await call(app, method, path, query, body)
+    return (time.process_time() - started) / requests * 1e6
+
+
+def encode_cases(status: Dict) -> Dict[str, float]:
+    """Encoding a scan status alone, in microseconds"""
+    cases = {
+        "pydantic model_dump_json": lambda: CompilerScanResponse(**status).model_dump_json(),
+        f"fast ({'orjson' if fast_json.orjson else 'json'})":
+            lambda: fast_json.dumps(fast_json.scan_response_payload(status)),
+    }
+    results = {}
+    for name, case in cases.items():
+        number = 20_000
+        results[name] = min(timeit.repeat(case, number=number, repeat=5)) / number * 1e6
+    return results
+
+
+async def run(requests: int) -> Dict:
+    from main import app  # after config is read, so the toggle below is the only difference
+
+    snippet = snippet_store.random()
+    state = state_backend.create("bench", snippet.data, "easy", snippet.random_bug_position())
+    game_query = f"game_id={state.current_game_id}".encode()
+    probe = json.dumps({"game_id": state.current_game_id, "line": 1, "column": 1}).encode()
+    with state_backend.session(state.current_game_id) as session:
+        status = session.update_compiler_scan()
+
+    routes = [
+        ("GET /api/compiler-scan-status", "GET", "/api/compiler-scan-status", game_query, b""),
+        ("POST /api/scan-bug-position", "POST", "/api/scan-bug-position", b"", probe),
+        ("GET /api/game-stats", "GET", "/api/game-stats", game_query, b""),
+    ]
+    result: Dict = {"requests": requests, "routes": {}, "encode_us": encode_cases(status)}
+    for name, method, path, query, body in routes:
+        timings = {}
+        for fast in (False, True):
+            config.FAST_JSON = fast
+            timings["fast" if fast else "pydantic"] = await time_route(app, requests, method, path, query, body)
+        timings["saved_us"] = timings["pydantic"] - timings["fast"]
+        result["routes"][name] = timings
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pydantic vs fast JSON response encoding")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per route and mode")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.requests))
+    print(f"{'route':<34}{'pydantic':>10}{'fast':>10}{'saved':>10}  (CPU µs/request)")
+    for name, timings in result["routes"].items():
+        print(f"{name:<34}{timings['pydantic']:>10.1f}{timings['fast']:>10.1f}{timings['saved_us']:>10.1f}")
+    print("encode only (µs):")
+    for name, micros in result["encode_us"].items():
+        print(f"  {name:<32}{micros:>8.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
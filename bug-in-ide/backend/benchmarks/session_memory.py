@@ -0,0 +1,66 @@
+"""Retained memory per game session.
+
+Run from the backend directory:
+
+    python -m benchmarks.session_memory [--sessions 10000] [--json out.json]
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+
+from services.game_state import GameState
+from services.snippet_store import snippet_store
+
+
+def measure(session_count: int, seed: int = 0) -> dict:
+    """Create `session_count` started games and report the bytes they retain"""
+    random.seed(seed)
+    snippet_store.load()
+    snippets = snippet_store.snippets
+    difficulties = ("easy", "medium", "hard")
+
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    states = []
+    for i in range(session_count):
+        snippet = snippets[i % len(snippets)]
+        state = GameState()
+        state.start_new_game("player", snippet.data, difficulties[i % 3], snippet.random_bug_position())
+        state.update_compiler_scan()
+        states.append(state)
+
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # The list holding the sessions is not part of a session
+    retained = current - baseline - sys.getsizeof(states)
+    return {
+        "sessions": session_count,
+        "bytes_total": retained,
+        "bytes_per_session": retained / session_count,
+        "peak_bytes": peak - baseline
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--json", help="write the result to this file")
+    args = parser.parse_args()
+
+    result = measure(args.sessions)
+    print(f"{result['sessions']} sessions: {result['bytes_total'] / 1e6:.2f} MB retained, "
+          f"{result['bytes_per_session']:.0f} bytes/session, peak {result['peak_bytes'] / 1e6:.2f} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
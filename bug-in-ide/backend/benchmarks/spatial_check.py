@@ -0,0 +1,94 @@
+"""Check FakeErrorIndex radius queries against a brute-force scan.
+
+Builds seeded random indexes, small enough to skip the grid and large
+enough to use it (dense and spread out), and compares query() and
+count_near() with a straight pass over every error. Query points include
+random ones plus the edge cases: radius 0, errors and queries at line or
+column 1, both sides of every grid cell boundary around them, and the
+largest column a position can have. Run from the backend directory:
+
+    python -m benchmarks.spatial_check
+    python -m benchmarks.spatial_check --errors 20000 --seed 3
+
+Exits non-zero on the first mismatch.
+"""
+import argparse
+import random
+import sys
+from typing import Iterator, List, Optional, Tuple
+
+from models.game import MAX_COORDINATE
+from services.spatial import CELL_SIZE, GRID_MIN_ERRORS, FakeErrorIndex
+
+RADII = (0, 1, 3, CELL_SIZE - 1, CELL_SIZE, 2 * CELL_SIZE + 1)
+
+
+def brute_force(positions: List[Tuple[int, int]], line: int, column: int, radius: int) -> List[Tuple[int, int]]:
+    return sorted((error_line, error_column) for error_line, error_column in positions
+                  if abs(error_line - line) <= radius and abs(error_column - column) <= radius)
+
+
+def random_positions(rng: random.Random, count: int, lines: int, columns: int) -> List[Tuple[int, int]]:
+    """`count` random errors, a few of them pinned to line 1, column 1 and the largest column"""
+    edges = [(1, 1), (1, rng.randint(1, columns)), (rng.randint(1, lines), 1), (1, MAX_COORDINATE),
+             (lines, MAX_COORDINATE)]
+    return edges + [(rng.randint(1, lines), rng.randint(1, columns)) for _ in range(count - len(edges))]
+
+
+def query_points(rng: random.Random, positions: List[Tuple[int, int]], lines: int, columns: int,
+                 count: int) -> Iterator[Tuple[int, int]]:
+    """Random points, a sample of the errors themselves, and grid boundaries near the edges"""
+    for _ in range(count):
+        yield rng.randint(1, lines), rng.randint(1, columns)
+    yield from rng.sample(positions, min(len(positions), count))
+    boundary = [1, 2, CELL_SIZE - 1, CELL_SIZE, CELL_SIZE + 1, 2 * CELL_SIZE,
+                MAX_COORDINATE - CELL_SIZE, MAX_COORDINATE - 1, MAX_COORDINATE]
+    for line in boundary[:6]:
+        for column in boundary:
+            yield line, column
+
+
+def check_index(positions: List[Tuple[int, int]], points: List[Tuple[int, int]]) -> Optional[str]:
+    """None when every query matches the brute-force answer, else the first difference"""
+    index = FakeErrorIndex(positions)
+    for line, column in points:
+        for radius in RADII:
+            expected = brute_force(positions, line, column, radius)
+            found = sorted((index.lines[i], index.columns[i]) for i in index.query(line, column, radius))
+            if found != expected:
+                return f"query({line}, {column}, {radius}): {found} != {expected}"
+            if index.count_near(line, column, radius) != len(expected):
+                return f"count_near({line}, {column}, {radius}) != {len(expected)}"
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FakeErrorIndex vs brute force")
+    parser.add_argument("--errors", type=int, default=5000, help="errors in the large indexes")
+    parser.add_argument("--queries", type=int, default=300, help="random query points per index")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [
+        ("small, scanned directly", GRID_MIN_ERRORS - 1, 40, 80),
+        ("exactly at the grid threshold", GRID_MIN_ERRORS, 40, 80),
+        ("large, dense", args.errors, 60, 120),
+        ("large, spread out", args.errors, 3000, 400),
+    ]
+    for name, count, lines, columns in cases:
+        positions = random_positions(rng, count, lines, columns)
+        points = list(query_points(rng, positions, lines, columns, args.queries))
+        mismatch = check_index(positions, points)
+        if mismatch is not None:
+            print(f"{name} ({len(positions)} errors): {mismatch}")
+            sys.exit(1)
+        print(f"{name}: {len(positions)} errors, {len(points) * len(RADII)} queries match")
+    empty = check_index([], [(1, 1), (5, 5)])
+    if empty is not None:
+        print(f"empty index: {empty}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Runtime settings for the backend, read once from environment variables."""
+from typing import Dict, Tuple
+import os
+import socket
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting, falling back to the default when unset"""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting, falling back to the default when unset"""
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_limits(name: str, default: Dict[str, Tuple[float, ...]]) -> Dict[str, Tuple[float, ...]]:
+    """Read per-route rate limits, "path=rate:burst[:game_rate:game_burst];...", over the defaults"""
+    limits = dict(default)
+    for item in filter(None, os.environ.get(name, "").split(";")):
+        path, _, numbers = item.partition("=")
+        try:
+            values = tuple(float(number) for number in numbers.split(":"))
+        except ValueError:
+            values = ()
+        pairs = zip(values[::2], values[1::2])
+        if len(values) not in (2, 4) or any(rate <= 0 or burst < 1 for rate, burst in pairs):
+            raise ValueError(f"{name}: {item!r} needs rate:burst[:game_rate:game_burst] with rates > 0 and bursts >= 1")
+        limits[path.strip()] = values
+    return limits
+
+
+# Threads for blocking work handed off from the event loop (SQLite access, file reads)
+THREADPOOL_SIZE = _env_int("BUG_IDE_THREADPOOL_SIZE", 40)
+
+# Session registry
+SESSION_TTL_SECONDS = _env_float("BUG_IDE_SESSION_TTL", 30 * 60)  # idle time before a game is evicted
+MAX_SESSIONS = _env_int("BUG_IDE_MAX_SESSIONS", 10_000)  # LRU cap on concurrent games
+
+# Where sessions live: "memory" (this process only) or "sqlite" (a file shared by
+# every worker on the host). WORKER_ID names this process as the owner of the
+# scan clocks of the games it starts.
+STATE_BACKEND = os.environ.get("BUG_IDE_STATE_BACKEND", "memory")
+STATE_DB = os.environ.get(
+    "BUG_IDE_STATE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sessions.sqlite3")
+)
+WORKER_ID = os.environ.get("BUG_IDE_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# Sticky routing: this worker's shard, encoded into every game_id it creates so
+# the dispatcher (or a proxy) can send all of a game's requests back to it
+WORKER_INDEX = _env_int("BUG_IDE_WORKER_INDEX", 0)
+
+# Compiler scan: "ticked" advances scans from the scheduler, "analytic" computes
+# the position from elapsed time whenever it is read and needs no scheduler
+SCAN_MODE = os.environ.get("BUG_IDE_SCAN_MODE", "ticked")
+
+# Scan event stream: longest silence before a keepalive comment is sent
+STREAM_KEEPALIVE_SECONDS = _env_float("BUG_IDE_STREAM_KEEPALIVE", 15.0)
+
+# Snippet store: how often snippets.json is checked for changes, in seconds
+SNIPPET_RELOAD_INTERVAL = _env_float("BUG_IDE_SNIPPET_RELOAD_INTERVAL", 5.0)
+
+# Game layouts (bug position plus fake errors) are generated ahead of time by a
+# background thread: how many are kept ready per snippet (0 generates them in the
+# request instead) and the most the thread builds per second
+LAYOUT_POOL_SIZE = _env_int("BUG_IDE_LAYOUT_POOL_SIZE", 32)
+LAYOUT_POOL_REFILL_RATE = _env_float("BUG_IDE_LAYOUT_POOL_REFILL_RATE", 1000.0)
+
+# Most probes accepted by one POST /api/scan-bug-position/batch, and how far back
+# (seconds) a probe's client timestamp may reach before the batch arrived
+MAX_PROBES_PER_BATCH = _env_int("BUG_IDE_MAX_PROBES_PER_BATCH", 256)
+PROBE_CLOCK_SKEW = _env_float("BUG_IDE_PROBE_CLOCK_SKEW", 1.0)
+
+# Hot routes (scan status, probes, game stats) encode their trusted payloads straight
+# to a raw JSON response instead of round-tripping through pydantic models; orjson is
+# used when installed
+FAST_JSON = os.environ.get("BUG_IDE_FAST_JSON", "").lower() in ("1", "true", "yes")
+
+# Admission control (off by default; when off the middleware is not installed at all).
+# Token buckets per client IP and route, plus per game_id on routes that act on one
+# game: requests/second and burst for each, "*" being every other /api/ route. Behind
+# a proxy every request comes from the proxy's address, so RATE_LIMIT_CLIENT_HEADER
+# must name the header holding the client's; dispatcher.py sets X-Real-IP and starts
+# its workers with this defaulted to it. Only set it when a proxy overwrites the
+# header, or clients can pick their own bucket. Past MAX_CONCURRENT_REQUESTS in flight (0 = no cap) requests are
+# shed with 503 instead of queueing.
+RATE_LIMIT_ENABLED = os.environ.get("BUG_IDE_RATE_LIMIT_ENABLED", "").lower() in ("1", "true", "yes")
+RATE_LIMITS = _env_limits("BUG_IDE_RATE_LIMITS", {
+    "*": (50.0, 100.0),
+    "/api/start-game": (1.0, 5.0),
+    "/api/start-simple-game": (1.0, 5.0),
+    "/api/scan-bug-position": (20.0, 40.0, 10.0, 20.0),
+    "/api/scan-bug-position/batch": (5.0, 10.0, 4.0, 8.0),
+    "/api/update-stats/bulk": (1.0, 2.0),
+})
+RATE_LIMIT_CLIENT_HEADER = os.environ.get("BUG_IDE_RATE_LIMIT_CLIENT_HEADER", "")
+MAX_CONCURRENT_REQUESTS = _env_int("BUG_IDE_MAX_CONCURRENT_REQUESTS", 256)
+
+# Frontend build: files up to this size are served from memory, larger ones from disk
+STATIC_INLINE_MAX_BYTES = _env_int("BUG_IDE_STATIC_INLINE_MAX_BYTES", 256 * 1024)
+
+# Leaderboard: SQLite file (":memory:" keeps it in RAM) and how many entries each board keeps
+LEADERBOARD_DB = os.environ.get(
+    "BUG_IDE_LEADERBOARD_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "leaderboard.sqlite3")
+)
+LEADERBOARD_TOP_K = _env_int("BUG_IDE_LEADERBOARD_TOP_K", 100)
+
+# Stats write-behind: rows per leaderboard transaction, longest wait before a
+# partial batch is written (seconds), and how many rows may be buffered
+STATS_FLUSH_SIZE = _env_int("BUG_IDE_STATS_FLUSH_SIZE", 500)
+STATS_FLUSH_INTERVAL = _env_float("BUG_IDE_STATS_FLUSH_INTERVAL", 0.2)
+STATS_MAX_QUEUE = _env_int("BUG_IDE_STATS_MAX_QUEUE", 100_000)
+
+# Logging: level, and how many lines per message template may be written per interval
+LOG_LEVEL = os.environ.get("BUG_IDE_LOG_LEVEL", "INFO")
+LOG_RATE_BURST = _env_int("BUG_IDE_LOG_RATE_BURST", 20)
+LOG_RATE_INTERVAL = _env_float("BUG_IDE_LOG_RATE_INTERVAL", 10.0)
+
+# Request profiling (off by default; when off the middleware is not installed at all).
+# Sampled requests, and requests carrying PROFILE_HEADER plus a valid X-Admin-Token, run
+# under the profiler: "sample" (stack sampler, also sees the threadpool) or "cprofile"
+# (deterministic). Either records the whole process while the request runs.
+PROFILE_ENABLED = os.environ.get("BUG_IDE_PROFILE_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = _env_float("BUG_IDE_PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_HEADER = os.environ.get("BUG_IDE_PROFILE_HEADER", "X-Profile")
+PROFILER = os.environ.get("BUG_IDE_PROFILER", "sample")
+PROFILE_INTERVAL = _env_float("BUG_IDE_PROFILE_INTERVAL", 0.001)  # sampler period in seconds
+PROFILE_BUFFER_SIZE = _env_int("BUG_IDE_PROFILE_BUFFER_SIZE", 50)
+# Required on admin endpoints; without it they are not mounted and the header trigger is ignored
+ADMIN_TOKEN = os.environ.get("BUG_IDE_ADMIN_TOKEN")
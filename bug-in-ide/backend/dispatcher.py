@@ -0,0 +1,181 @@
+"""Front dispatcher pinning every game to one worker process.
+
+Starts N uvicorn workers on consecutive ports, each with its own
+BUG_IDE_WORKER_INDEX, and listens in front of them. Requests carrying a
+game_id (query string or JSON body) go to the worker whose shard is encoded
+in the id; everything else is spread round-robin. Each worker keeps its
+sessions in process, so no request ever waits on another process's lock.
+
+    python dispatcher.py --workers 4 --port 8000
+
+Workers only listen on 127.0.0.1, so each request reaches them from the
+dispatcher; it replaces any X-Real-IP header with the client's address so
+workers can still tell clients apart.
+
+Behind an existing proxy the dispatcher is not needed: route on the id
+prefix instead, e.g. nginx `map $arg_game_id $shard { ~^(\\d+)- $1; }`.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from services.routing import pick_worker
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_HEAD_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+_HOP_BY_HOP = (b"connection", b"keep-alive", b"proxy-connection")
+CLIENT_ADDRESS_HEADER = b"x-real-ip"
+_DROPPED = _HOP_BY_HOP + (CLIENT_ADDRESS_HEADER,)
+_BAD_REQUEST = b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def parse_head(head: bytes) -> Tuple[str, List[Tuple[bytes, bytes]]]:
+    """Request target and header list of a raw HTTP/1.1 request head (ValueError when malformed)"""
+    lines = head.split(b"\r\n")
+    request_line = lines[0].split(b" ")
+    if len(request_line) != 3:
+        raise ValueError("malformed request line")
+    target = request_line[1].decode("latin-1")
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(b":")
+            headers.append((name.strip().lower(), value.strip()))
+    return target, headers
+
+
+def game_id_from(target: str, headers: List[Tuple[bytes, bytes]], body: bytes) -> Optional[str]:
+    """The game a request belongs to, if any"""
+    values = parse_qs(urlsplit(target).query).get("game_id")
+    if values:
+        return values[0]
+    if body and dict(headers).get(b"content-type", b"").startswith(b"application/json"):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(payload, dict) and isinstance(payload.get("game_id"), str):
+            return payload["game_id"]
+    return None
+
+
+class Dispatcher:
+    """Forwards one request per client connection to the worker owning its game"""
+
+    def __init__(self, upstream_ports: List[int], upstream_host: str = "127.0.0.1"):
+        self.upstream_ports = upstream_ports
+        self.upstream_host = upstream_host
+        self._round_robin = itertools.cycle(range(len(upstream_ports)))
+
+    def choose(self, game_id: Optional[str]) -> int:
+        if game_id is None:
+            return self.upstream_ports[next(self._round_robin)]
+        return self.upstream_ports[pick_worker(game_id, len(self.upstream_ports))]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            try:
+                target, headers = parse_head(head)
+                header_map = dict(headers)
+                length = int(header_map.get(b"content-length", b"0") or 0)
+            except ValueError:
+                writer.write(_BAD_REQUEST)
+                return
+            if length < 0:
+                writer.write(_BAD_REQUEST)
+                return
+            if b"chunked" in header_map.get(b"transfer-encoding", b""):
+                writer.write(b"HTTP/1.1 411 Length Required\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            if length > MAX_BODY_BYTES:
+                writer.write(b"HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            body = await reader.readexactly(length) if length else b""
+
+            port = self.choose(game_id_from(target, headers, body))
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(self.upstream_host, port)
+            except OSError:
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+
+            # One request per upstream connection: the response ends when the worker closes it,
+            # which also lets event streams flow through unbuffered
+            request_line = head.split(b"\r\n", 1)[0]
+            forwarded = [request_line]
+            forwarded += [name + b": " + value for name, value in headers if name not in _DROPPED]
+            peer = writer.get_extra_info("peername")
+            if peer:
+                forwarded.append(b"X-Real-IP: " + str(peer[0]).encode("latin-1"))
+            forwarded += [b"Connection: close", b"", b""]
+            upstream_writer.write(b"\r\n".join(forwarded) + body)
+            await upstream_writer.drain()
+            try:
+                while True:
+                    chunk = await upstream_reader.read(65536)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    await writer.drain()
+            finally:
+                upstream_writer.close()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def spawn_workers(workers: int, base_port: int) -> List[subprocess.Popen]:
+    """Start one uvicorn process per shard"""
+    processes = []
+    for index in range(workers):
+        env = dict(os.environ, BUG_IDE_WORKER_INDEX=str(index))
+        # Rate limits apply per player, not to the dispatcher's own address
+        env.setdefault("BUG_IDE_RATE_LIMIT_CLIENT_HEADER", CLIENT_ADDRESS_HEADER.decode("latin-1"))
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                   "--port", str(base_port + index)]
+        processes.append(subprocess.Popen(command, cwd=BACKEND_DIR, env=env))
+    return processes
+
+
+async def serve(host: str, port: int, upstream_ports: List[int]) -> None:
+    dispatcher = Dispatcher(upstream_ports)
+    server = await asyncio.start_server(dispatcher.handle, host, port, limit=MAX_HEAD_BYTES)
+    print(f"Dispatching {host}:{port} -> workers on ports {upstream_ports}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sticky front dispatcher for several backend workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--base-port", type=int, default=8100, help="first worker port")
+    args = parser.parse_args()
+
+    processes = spawn_workers(args.workers, args.base_port)
+    try:
+        asyncio.run(serve(args.host, args.port, [args.base_port + i for i in range(args.workers)]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,68 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.game import router as game_router
+from services.scan_scheduler import scan_scheduler
+from services.snippet_store import snippet_store
+from services.exit_portals import precompute_valid_portals
+from services.leaderboard import leaderboard
+from services.stats_writer import stats_writer
+from services.layout_pool import layout_pool
+from services.metrics import MetricsMiddleware
+from services.log import configure_logging
 
-from fastapi.staticfiles import StaticFiles
+from services.static_files import StaticIndex
+import anyio
+import logging
 import os
+import config
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    # Routes run on the event loop; blocking work they hand off (SQLite, file reads)
+    # shares this many threads
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.THREADPOOL_SIZE
+    if frontend_files is not None:
+        frontend_files.load()  # index the build once instead of stat-ing it per request
+    else:
+        logger.warning("event=frontend_missing path=%s", frontend_dist)
+    # Parse and index the code snippets once, before the first game starts
+    snippet_store.load()
+    precompute_valid_portals(snippet.line_count for snippet in snippet_store.snippets)
+    layout_pool.fill()  # the first games start on ready layouts too
+    # Compiler scans are driven by one deadline scheduler on the event loop;
+    # its task is only started when the first game is scheduled
+    await scan_scheduler.start()
+    yield
+    await scan_scheduler.stop()
+    layout_pool.close()
+    stats_writer.close()  # write anything still buffered
+    leaderboard.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Opt-in admission control; installed inside the metrics and CORS middleware so
+# rejections are still counted and carry CORS headers
+if config.RATE_LIMIT_ENABLED:
+    from services.rate_limit import RateLimitMiddleware
+    app.add_middleware(RateLimitMiddleware)
+
+# Per-route latency histograms for /api/metrics
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in request profiling; when disabled nothing is imported or installed
+if config.PROFILE_ENABLED:
+    from services.profiling import ProfilingMiddleware, profile_store
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+    # The profile endpoints fail closed: no token, no endpoints
+    if config.ADMIN_TOKEN:
+        from api.admin import router as admin_router
+        app.include_router(admin_router, prefix="/api/admin")
+    else:
+        logger.warning("event=admin_disabled reason=no_admin_token")
 
 # Enable CORS for all origins
 app.add_middleware(
@@ -19,19 +76,22 @@ app.add_middleware(
 # Register game routes
 app.include_router(game_router, prefix="/api")
 
-# Serve frontend build
-frontend_dist = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend', 'dist'))
-app.mount("/", StaticFiles(directory=frontend_dist, html=True), name="static")
-
 @app.get("/api/")
-def root():
+async def root():
     return {"status": "ok"}
 
 # Add CORS preflight handler
 @app.options("/{path:path}")
-def options_handler():
+async def options_handler():
     return {"message": "OK"}
 
+# Serve the frontend build when there is one (API-only deployments and tests have none).
+# Mounted last so the catch-all "/" does not shadow the routes above.
+frontend_dist = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend', 'dist'))
+frontend_files = StaticIndex(frontend_dist) if os.path.isdir(frontend_dist) else None
+if frontend_files is not None:
+    app.mount("/", frontend_files, name="static")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
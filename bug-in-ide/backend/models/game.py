@@ -1,11 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
 
+# Positions are packed as (line << 16) | column on the server
+MAX_COORDINATE = (1 << 16) - 1
+
+
 class ScanBugRequest(BaseModel):
     """Request model for scanning bug position"""
-    line: int
-    column: int
+    game_id: str
+    line: int = Field(ge=1, le=MAX_COORDINATE)
+    column: int = Field(ge=1, le=MAX_COORDINATE)
 
 
 class ScanBugResponse(BaseModel):
@@ -14,12 +19,41 @@ class ScanBugResponse(BaseModel):
     message: str
 
 
+class ScanProbe(BaseModel):
+    """One guess in a batch, stamped with the client's clock"""
+    line: int = Field(ge=1, le=MAX_COORDINATE)
+    column: int = Field(ge=1, le=MAX_COORDINATE)
+    client_time: Optional[float] = None  # seconds since the epoch; the server clamps it
+
+
+class ScanBatchRequest(BaseModel):
+    """Request model for scanning many positions at once"""
+    game_id: str
+    probes: List[ScanProbe]
+
+
+class ScanProbeResult(BaseModel):
+    """Result of one probe, in the order the probes were sent"""
+    line: int
+    column: int
+    hit: bool
+    result: str  # hit, near, miss, or late (made after the game ended)
+    message: str
+
+
+class ScanBatchResponse(BaseModel):
+    """Response model for batched scan results"""
+    results: List[ScanProbeResult]
+    game_active: bool
+
+
 class UpdateStatsRequest(BaseModel):
     """Request model for submitting player statistics"""
     player_name: str
     time_survived: float
     status: str  # e.g., "escaped", "caught", "timeout"
     bug_location: Dict[str, int]  # {"line": int, "column": int}
+    difficulty: Optional[str] = None  # easy, medium, hard
 
 
 class PlayerStats(BaseModel):
@@ -28,6 +62,7 @@ class PlayerStats(BaseModel):
     time_survived: float
     status: str
     bug_location: Dict[str, int]
+    difficulty: Optional[str] = None
 
 
 class LeaderboardEntry(BaseModel):
@@ -101,6 +136,7 @@ class StartGameRequest(BaseModel):
     """Request model for starting a new game"""
     player_name: str
     difficulty: Optional[str] = "medium"
+    language: Optional[str] = None  # restrict the snippet to one language
     auto_scan: Optional[bool] = True  # Enable automatic compiler scan
 
 
@@ -112,6 +148,7 @@ class StartGameResponse(BaseModel):
     code_snippet: CodeSnippetResponse
     compiler_scan_position: Dict[str, int]
     scan_speed: float  # seconds between scans
+    snippet_id: Optional[str] = None  # content id for GET /api/snippets/{snippet_id}
 
 
 class CompilerScanStatus(BaseModel):
@@ -1,15 +1,22 @@
 import random
-from typing import Dict, List
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 class ExitPortal:
+    __slots__ = ("line", "clue")
+
     def __init__(self, line: int, clue: str):
         self.line = line
         self.clue = clue
-    
+
     def to_dict(self) -> Dict:
         return {"line": self.line, "clue": self.clue}
 
+    def __lt__(self, other: "ExitPortal") -> bool:
+        return self.line < other.line
+
 
 # Predefined list of exit portals with line numbers and clues
 EXIT_PORTALS = [
@@ -36,67 +43,133 @@ EXIT_PORTALS = [
 ]
 
 
-def get_random_exit_portal() -> Dict:
+class PortalIndex:
+    """Portals sorted by line, never modified once built.
+
+    Lookups and range queries bisect the sorted lines. The portals that fit
+    a snippet are always a prefix of the sorted list, so the valid set for
+    each snippet length passed in is sliced when the index is built; picking
+    a portal for a game is then a dict lookup plus random.choice. Other
+    lengths are sliced on each call and not kept. Additions and new lengths
+    build a new index (copy-on-write), so readers never need a lock.
+    """
+
+    __slots__ = ("portals", "lines", "_valid")
+
+    def __init__(self, portals: Iterable[ExitPortal], line_counts: Iterable[int] = ()):
+        self.portals: List[ExitPortal] = sorted(portals)
+        self.lines: List[int] = [portal.line for portal in self.portals]
+        # snippet line count -> portals that fit inside it
+        self._valid: Dict[int, Tuple[ExitPortal, ...]] = {
+            line_count: self._fitting(line_count) for line_count in line_counts
+        }
+
+    def _fitting(self, line_count: int) -> Tuple[ExitPortal, ...]:
+        return tuple(self.portals[:bisect_right(self.lines, line_count)])
+
+    def valid_for(self, line_count: int) -> Tuple[ExitPortal, ...]:
+        """Portals on a line that exists in a snippet of `line_count` lines"""
+        valid = self._valid.get(line_count)
+        return valid if valid is not None else self._fitting(line_count)
+
+    def by_line(self, line: int) -> Optional[ExitPortal]:
+        i = bisect_left(self.lines, line)
+        if i < len(self.lines) and self.lines[i] == line:
+            return self.portals[i]
+        return None
+
+    def in_range(self, start_line: int, end_line: int) -> List[ExitPortal]:
+        return self.portals[bisect_left(self.lines, start_line):bisect_right(self.lines, end_line)]
+
+    def with_portal(self, portal: ExitPortal) -> "PortalIndex":
+        """A new index that also holds `portal`, with the same snippet lengths precomputed"""
+        return PortalIndex(self.portals + [portal], list(self._valid))
+
+    def with_line_counts(self, line_counts: Iterable[int]) -> "PortalIndex":
+        """A new index with the valid sets for these snippet lengths precomputed as well"""
+        return PortalIndex(self.portals, set(self._valid).union(line_counts))
+
+
+# The live index; replaced (never mutated) by add_custom_portal and precompute_valid_portals
+portal_index = PortalIndex(EXIT_PORTALS)
+_write_lock = threading.Lock()
+
+
+def get_random_exit_portal(line_count: Optional[int] = None) -> Optional[Dict]:
     """
     Returns a random exit portal with line number and clue.
-    
+
+    Args:
+        line_count (int, optional): Only pick portals that fit a snippet of this many lines
+
     Returns:
-        Dict: A dictionary containing 'line' (int) and 'clue' (str)
+        Dict: A dictionary containing 'line' (int) and 'clue' (str), or None if no portal fits
     """
-    portal = random.choice(EXIT_PORTALS)
-    return portal.to_dict()
+    index = portal_index
+    portals = index.portals if line_count is None else index.valid_for(line_count)
+    if not portals:
+        return None
+    return random.choice(portals).to_dict()
 
 
 def get_portal_by_line(line_number: int) -> Dict:
     """
     Returns a specific portal by line number if it exists.
-    
+
     Args:
         line_number (int): The line number to search for
-        
+
     Returns:
         Dict: Portal data if found, None otherwise
     """
-    for portal in EXIT_PORTALS:
-        if portal.line == line_number:
-            return portal.to_dict()
-    return None
+    portal = portal_index.by_line(line_number)
+    return portal.to_dict() if portal is not None else None
 
 
 def get_all_portals() -> List[Dict]:
     """
-    Returns all available exit portals.
-    
+    Returns all available exit portals, sorted by line.
+
     Returns:
         List[Dict]: List of all portal dictionaries
     """
-    return [portal.to_dict() for portal in EXIT_PORTALS]
+    return [portal.to_dict() for portal in portal_index.portals]
 
 
 def add_custom_portal(line: int, clue: str) -> None:
     """
-    Add a custom exit portal to the list.
-    
+    Add a custom exit portal. Safe to call while other threads read portals.
+
     Args:
         line (int): Line number for the portal
         clue (str): Clue text for the portal
     """
-    EXIT_PORTALS.append(ExitPortal(line, clue))
+    global portal_index
+    with _write_lock:
+        portal_index = portal_index.with_portal(ExitPortal(line, clue))
+
+
+def precompute_valid_portals(line_counts: Iterable[int]) -> None:
+    """
+    Build the valid-portal sets for the snippets in play, e.g. at startup.
+
+    Args:
+        line_counts (Iterable[int]): Line counts of the loaded snippets
+    """
+    global portal_index
+    with _write_lock:
+        portal_index = portal_index.with_line_counts(line_counts)
 
 
 def get_portals_in_range(start_line: int, end_line: int) -> List[Dict]:
     """
     Get all portals within a specific line range.
-    
+
     Args:
         start_line (int): Starting line number (inclusive)
         end_line (int): Ending line number (inclusive)
-        
+
     Returns:
         List[Dict]: List of portals within the range
     """
-    return [
-        portal.to_dict() 
-        for portal in EXIT_PORTALS 
-        if start_line <= portal.line <= end_line
-    ]
+    return [portal.to_dict() for portal in portal_index.in_range(start_line, end_line)]
@@ -0,0 +1,31 @@
+from typing import Any, Dict, Optional
+import json
+
+from starlette.responses import Response
+
+try:
+    import orjson  # optional: a faster encoder for the fast path
+except ImportError:
+    orjson = None
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode trusted, JSON-native data (dicts, lists, str, int, float, bool, None)"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(payload: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """A raw JSON Response: FastAPI skips response_model validation for Response objects"""
+    return Response(content=dumps(payload), status_code=status_code, headers=headers,
+                    media_type="application/json")
+
+
+def scan_response_payload(status: Dict) -> Dict:
+    """The CompilerScanResponse shape of a GameState scan status, without building the models"""
+    return {
+        "scan_status": status["scan_status"],
+        "game_active": status["game_active"],
+        "time_elapsed": float(status["time_elapsed"])
+    }
@@ -1,67 +1,163 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Tuple
+import logging
 import random
+import threading
 import time
-import uuid
-from models.game import PlayerStats, LeaderboardEntry
+
+import config
+from services.metrics import SCAN_TICKS
+from services.routing import new_game_id
+from services.spatial import FakeErrorIndex
+
+logger = logging.getLogger(__name__)
+
+# Compiler scan modes: "ticked" steps the scan one column at a time from a
+# scheduler, "analytic" derives the position from the elapsed time on read
+SCAN_MODE_TICKED = "ticked"
+SCAN_MODE_ANALYTIC = "analytic"
+
+# Difficulty rules (also used by the Monte Carlo simulation in services.simulation)
+SCAN_SPEEDS = {"easy": 3.0, "medium": 2.0, "hard": 1.0}  # seconds between scan steps
+FAKE_ERROR_COUNT = (8, 15)  # fake errors per game, inclusive range
+FAKE_ERROR_SPREAD = (10, 20)  # how far from the bug they land, in lines and columns
+NEAR_TOLERANCE = (2, 5)  # a probe this close to the bug (lines, columns) is "near"
+INTERFERENCE_RADIUS = 3  # fake errors this close to a near probe interfere with detection
+
+
+def detection_chance(nearby_fake_errors: int) -> float:
+    """Odds that a probe near the bug reports it; each nearby fake error lowers them"""
+    return max(0.3, 0.6 - nearby_fake_errors * 0.1)
+
+
+# Positions are packed into one int as (line << 16) | column. Columns never
+# reach 2**16, so comparing packed ints compares positions in reading order.
+# Only positions the server made are packed; client coordinates are compared
+# line and column apart, so an oversized column cannot spill into the line.
+_COLUMN_BITS = 16
+_COLUMN_MASK = (1 << _COLUMN_BITS) - 1
+_NO_POSITION = -1
+_START_POSITION = (1 << _COLUMN_BITS) | 1  # line 1, column 1
+
+_NO_FAKE_ERRORS = FakeErrorIndex()
+
+
+def pack_position(line: int, column: int) -> int:
+    """Pack a line/column pair into a single int"""
+    return (line << _COLUMN_BITS) | column
+
+
+def unpack_position(packed: int) -> Dict[str, int]:
+    """Expand a packed position into the {"line", "column"} dict used by the API"""
+    return {"line": packed >> _COLUMN_BITS, "column": packed & _COLUMN_MASK}
+
+
+def generate_fake_errors(bug_line: int, bug_column: int, count: Optional[int] = None,
+                         line_lengths: Optional[Sequence[int]] = None) -> FakeErrorIndex:
+    """Scatter fake errors around the bug (8-15 unless `count` is given).
+    
+    With `line_lengths` (characters per snippet line) every error is clamped
+    onto a line that exists and a column within it; without, positions are
+    only kept positive.
+    """
+    if count is None:
+        count = random.randint(*FAKE_ERROR_COUNT)
+    
+    line_spread, column_spread = FAKE_ERROR_SPREAD
+    positions = []
+    for _ in range(count):
+        # Generate positions within a reasonable range of the bug
+        fake_line = max(1, bug_line + random.randint(-line_spread, line_spread))
+        fake_column = max(1, bug_column + random.randint(-column_spread, column_spread))
+        if line_lengths:
+            fake_line = min(fake_line, len(line_lengths))
+            fake_column = min(fake_column, max(1, line_lengths[fake_line - 1]))
+        
+        # Don't place fake error exactly on the bug
+        if fake_line != bug_line or fake_column != bug_column:
+            positions.append((fake_line, fake_column))
+    
+    # Build the spatial index once; every later lookup goes through it
+    return FakeErrorIndex(positions)
 
 
 class GameState:
-    def __init__(self):
-        self.bug_position: Optional[Dict[str, int]] = None
-        self.fake_errors: List[Dict[str, int]] = []
-        self.player_stats: List[PlayerStats] = []
+    # Slots keep a session to a fixed set of small fields; positions are packed
+    # ints and dicts are only created when a caller asks for them
+    __slots__ = (
+        "_bug", "fake_error_index", "current_game_id", "game_start_time",
+        "current_code_snippet", "scan_mode", "_scan_active", "_scan_position",
+        "scan_speed", "last_scan_time", "scan_stopped_at", "total_lines",
+        "max_columns_per_line", "last_probe_time", "lock"
+    )
+    
+    def __init__(self, scan_mode: str = config.SCAN_MODE):
+        self._bug: int = _NO_POSITION
+        self.fake_error_index = _NO_FAKE_ERRORS
         self.current_game_id: Optional[str] = None
         self.game_start_time: Optional[float] = None
         self.current_code_snippet: Optional[Dict] = None
         
         # Compiler scan state
-        self.compiler_scan_active: bool = False
-        self.compiler_scan_position: Dict[str, int] = {"line": 1, "column": 1}
+        self.scan_mode: str = scan_mode
+        self._scan_active: bool = False
+        self._scan_position: int = _START_POSITION
         self.scan_speed: float = 2.0  # seconds between scans
-        self.last_scan_time: float = 0
+        self.last_scan_time: float = 0  # in analytic mode: when the scan started
+        self.scan_stopped_at: Optional[float] = None
         self.total_lines: int = 0
         self.max_columns_per_line: int = 80
+        self.last_probe_time: float = 0  # latest client time accepted from a probe batch
+
+        # Guards this session against concurrent requests and the scan loop
+        self.lock = threading.RLock()
+
+    def __getstate__(self) -> Dict:
+        """Pickle support for shared state backends; the lock stays per process"""
+        return {name: getattr(self, name) for name in self.__slots__ if name != "lock"}
+
+    def __setstate__(self, state: Dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.lock = threading.RLock()
+    
+    @property
+    def bug_position(self) -> Optional[Dict[str, int]]:
+        """The bug's position as a dict, or None before a bug is placed"""
+        if self._bug == _NO_POSITION:
+            return None
+        return unpack_position(self._bug)
     
-    def set_bug_position(self, line: int, column: int) -> None:
+    @bug_position.setter
+    def bug_position(self, position: Optional[Dict[str, int]]) -> None:
+        self._bug = _NO_POSITION if position is None else pack_position(position["line"], position["column"])
+    
+    def set_bug_position(self, line: int, column: int, fake_error_count: Optional[int] = None) -> None:
         """Set the bug's position and place it strategically among fake errors"""
-        self.bug_position = {"line": line, "column": column}
+        self._bug = pack_position(line, column)
         
         # Generate fake errors around the bug position to make it harder to find
-        self._generate_fake_errors_around_bug()
+        self._generate_fake_errors_around_bug(fake_error_count)
     
     def get_bug_position(self) -> Optional[Dict[str, int]]:
         """Get the current bug position"""
         return self.bug_position
     
-    def _generate_fake_errors_around_bug(self) -> None:
+    def _generate_fake_errors_around_bug(self, num_fake_errors: Optional[int] = None) -> None:
         """Generate fake error positions around the bug to make it harder to find"""
-        if not self.bug_position:
+        if self._bug == _NO_POSITION:
             return
         
-        bug_line = self.bug_position["line"]
-        bug_column = self.bug_position["column"]
-        
-        # Clear existing fake errors
-        self.fake_errors = []
-        
-        # Generate 8-15 fake errors in the vicinity of the bug
-        num_fake_errors = random.randint(8, 15)
-        
-        for _ in range(num_fake_errors):
-            # Generate positions within a reasonable range of the bug
-            fake_line = bug_line + random.randint(-10, 10)
-            fake_column = bug_column + random.randint(-20, 20)
-            
-            # Ensure positions are positive
-            fake_line = max(1, fake_line)
-            fake_column = max(1, fake_column)
-            
-            # Don't place fake error exactly on the bug
-            if fake_line != bug_line or fake_column != bug_column:
-                self.fake_errors.append({
-                    "line": fake_line,
-                    "column": fake_column
-                })
+        self.fake_error_index = generate_fake_errors(self._bug >> _COLUMN_BITS, self._bug & _COLUMN_MASK,
+                                                     num_fake_errors)
+    
+    @property
+    def fake_errors(self) -> List[Dict[str, int]]:
+        """Fake error positions as dicts (built on demand from the index)"""
+        return self.fake_error_index.to_dicts()
+    
+    @fake_errors.setter
+    def fake_errors(self, errors: List[Dict[str, int]]) -> None:
+        self.fake_error_index = FakeErrorIndex((error["line"], error["column"]) for error in errors)
     
     def set_fake_errors(self, errors: List[Dict[str, int]]) -> None:
         """Manually set fake error positions"""
@@ -71,57 +167,47 @@ class GameState:
         """Get all fake error positions"""
         return self.fake_errors
     
-    def add_player_stats(self, player_stat: PlayerStats) -> None:
-        """Add a player's game statistics"""
-        self.player_stats.append(player_stat)
-    
-    def get_leaderboard(self, limit: int = 5) -> List[LeaderboardEntry]:
-        """Get leaderboard sorted by survival time (descending)"""
-        sorted_stats = sorted(
-            self.player_stats, 
-            key=lambda x: x.time_survived, 
-            reverse=True
-        )
-        
-        top_players = sorted_stats[:limit]
-        
-        return [
-            LeaderboardEntry(
-                player_name=stat.player_name,
-                time_survived=stat.time_survived
-            )
-            for stat in top_players
-        ]
+    def get_fake_error_count(self) -> int:
+        """Number of fake errors in the current game"""
+        return len(self.fake_error_index)
     
     def reset_game(self) -> None:
-        """Reset the game state (except player stats for leaderboard persistence)"""
-        self.bug_position = None
-        self.fake_errors = []
+        """Reset the game state"""
+        self._bug = _NO_POSITION
+        self.fake_error_index = _NO_FAKE_ERRORS
         self.current_game_id = None
         self.game_start_time = None
         self.current_code_snippet = None
-        self.compiler_scan_active = False
-        self.compiler_scan_position = {"line": 1, "column": 1}
+        self._scan_active = False
+        self._scan_position = _START_POSITION
         self.last_scan_time = 0
+        self.scan_stopped_at = None
+        self.last_probe_time = 0
     
-    def start_new_game(self, player_name: str, code_snippet: Dict, difficulty: str = "medium") -> str:
-        """Start a new game session"""
+    def start_new_game(self, player_name: str, code_snippet: Dict, difficulty: str = "medium",
+                       bug_position: Optional[Tuple[int, int]] = None,
+                       fake_errors: Optional[FakeErrorIndex] = None) -> str:
+        """Start a new game session (bug placed at `bug_position` or at random).
+        
+        A pre-generated layout passes both `bug_position` and `fake_errors`,
+        which are then used as they are.
+        """
         self.reset_game()
-        self.current_game_id = str(uuid.uuid4())
+        self.current_game_id = new_game_id()
         self.game_start_time = time.time()
         self.current_code_snippet = code_snippet
         self.total_lines = len(code_snippet.get("lines", []))
         
-        # Set scan speed based on difficulty
-        if difficulty == "easy":
-            self.scan_speed = 3.0
-        elif difficulty == "hard":
-            self.scan_speed = 1.0
-        else:  # medium
-            self.scan_speed = 2.0
+        # Set scan speed based on difficulty (anything unknown plays as medium)
+        self.scan_speed = SCAN_SPEEDS.get(difficulty, SCAN_SPEEDS["medium"])
         
         # Generate a random bug position within the code
-        if self.total_lines > 0:
+        if bug_position is not None and fake_errors is not None:
+            self._bug = pack_position(*bug_position)
+            self.fake_error_index = fake_errors
+        elif bug_position is not None:
+            self.set_bug_position(*bug_position)
+        elif self.total_lines > 0:
             random_line = random.randint(1, self.total_lines)
             random_column = random.randint(1, 50)  # Reasonable column range
             self.set_bug_position(random_line, random_column)
@@ -132,77 +218,135 @@ class GameState:
         
         return self.current_game_id
     
+    @property
+    def compiler_scan_active(self) -> bool:
+        """Whether the compiler scan is still running"""
+        if self.scan_mode == SCAN_MODE_ANALYTIC:
+            return self._analytic_scan(time.time())[1]
+        return self._scan_active
+    
+    @compiler_scan_active.setter
+    def compiler_scan_active(self, active: bool) -> None:
+        self._scan_active = active
+    
+    @property
+    def compiler_scan_position(self) -> Dict[str, int]:
+        """Current line/column of the compiler scan"""
+        if self.scan_mode == SCAN_MODE_ANALYTIC:
+            return self._index_to_position(self._analytic_scan(time.time())[0])
+        return unpack_position(self._scan_position)
+    
+    @compiler_scan_position.setter
+    def compiler_scan_position(self, position: Dict[str, int]) -> None:
+        self._scan_position = pack_position(position["line"], position["column"])
+    
     def update_compiler_scan(self) -> Dict:
         """Update compiler scan position and return current status"""
-        if not self.compiler_scan_active:
+        if self.scan_mode == SCAN_MODE_ANALYTIC:
+            # Nothing to advance: the position is a function of the clock
+            return self._get_scan_status()
+        
+        if not self._scan_active:
             return self._get_scan_status()
         
         current_time = time.time()
-        if current_time - self.last_scan_time >= self.scan_speed:
+        # Catch up on every step that fell due since the last update so the
+        # scan keeps its exact pace no matter when we get called
+        while current_time >= self.next_scan_time:
             self._advance_scan_position()
-            self.last_scan_time = current_time
+            self.last_scan_time += self.scan_speed
             
             # Check if scan reached the bug
             if self._scan_reached_bug():
-                self.compiler_scan_active = False
+                self._scan_active = False
                 return self._get_scan_status(game_over=True)
             
             # Check if scan finished all lines
-            if self.compiler_scan_position["line"] > self.total_lines:
-                self.compiler_scan_active = False
+            if self._scan_position >> _COLUMN_BITS > self.total_lines:
+                self._scan_active = False
                 return self._get_scan_status(game_over=True)
         
         return self._get_scan_status()
     
+    @property
+    def next_scan_time(self) -> float:
+        """Wall-clock time at which the scan takes its next step"""
+        if self.scan_mode == SCAN_MODE_ANALYTIC:
+            steps = self._analytic_scan(time.time())[0]
+            return self.last_scan_time + (steps + 1) * self.scan_speed
+        return self.last_scan_time + self.scan_speed
+    
+    def _scan_end_index(self) -> int:
+        """Linear scan index at which the game ends (bug reached or last line passed)"""
+        columns = self.max_columns_per_line
+        end_index = self.total_lines * columns
+        if self._bug != _NO_POSITION:
+            # Same rule as _scan_reached_bug: on the bug's line from its column on,
+            # or anywhere past that line
+            bug_column = min(self._bug & _COLUMN_MASK, columns + 1)
+            end_index = min(end_index, ((self._bug >> _COLUMN_BITS) - 1) * columns + bug_column - 1)
+        # The check only happens after a step, so the scan always moves at least once
+        return max(1, end_index)
+    
+    def _analytic_scan(self, now: float) -> Tuple[int, bool]:
+        """Closed-form scan index at `now` and whether the scan is still running"""
+        if not self._scan_active and self.scan_stopped_at is None:
+            return 0, False
+        if self.scan_stopped_at is not None:
+            now = min(now, self.scan_stopped_at)
+        
+        steps = int(max(0.0, now - self.last_scan_time) // self.scan_speed)
+        end_index = self._scan_end_index()
+        if steps >= end_index:
+            return end_index, False
+        return steps, self._scan_active
+    
+    def _index_to_position(self, index: int) -> Dict[str, int]:
+        """Convert a linear scan index (0 = line 1, column 1) to a position"""
+        line, column = divmod(index, self.max_columns_per_line)
+        return {"line": line + 1, "column": column + 1}
+    
     def _advance_scan_position(self) -> None:
         """Advance the compiler scan to the next position"""
-        current_line = self.compiler_scan_position["line"]
-        current_column = self.compiler_scan_position["column"]
-        
         # Move to next column
-        current_column += 1
+        position = self._scan_position + 1
         
         # If we've reached the end of the line, move to next line
-        if current_column > self.max_columns_per_line:
-            current_column = 1
-            current_line += 1
+        if position & _COLUMN_MASK > self.max_columns_per_line:
+            position = ((position >> _COLUMN_BITS) + 1 << _COLUMN_BITS) | 1
         
         # Update position
-        self.compiler_scan_position = {
-            "line": current_line,
-            "column": current_column
-        }
+        self._scan_position = position
+        SCAN_TICKS.inc()
         
-        # Debug print to see movement
-        print(f"Compiler scan moved to line {current_line}, column {current_column}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("event=scan_moved game_id=%s line=%d column=%d", self.current_game_id,
+                         position >> _COLUMN_BITS, position & _COLUMN_MASK)
     
     def _scan_reached_bug(self) -> bool:
         """Check if the compiler scan has reached the bug position"""
-        if not self.bug_position:
+        if self._bug == _NO_POSITION:
             return False
         
-        scan_line = self.compiler_scan_position["line"]
-        scan_column = self.compiler_scan_position["column"]
-        bug_line = self.bug_position["line"]
-        bug_column = self.bug_position["column"]
-        
-        # Check if scan has passed the bug position
-        if scan_line > bug_line:
-            return True
-        elif scan_line == bug_line and scan_column >= bug_column:
-            return True
-        
-        return False
+        # Packed positions compare in reading order: the scan has reached the
+        # bug once it is on a later line, or on the same line at or past its column
+        return self._scan_position >= self._bug
     
     def _get_scan_status(self, game_over: bool = False) -> Dict:
         """Get current compiler scan status"""
-        if not self.compiler_scan_active:
+        if self.scan_mode == SCAN_MODE_ANALYTIC:
+            return self._get_analytic_scan_status()
+        
+        scan_line = self._scan_position >> _COLUMN_BITS
+        scan_column = self._scan_position & _COLUMN_MASK
+        
+        if not self._scan_active:
             progress = 100.0
             time_remaining = 0.0
         else:
             # Calculate progress based on position
             total_positions = self.total_lines * self.max_columns_per_line
-            current_position = (self.compiler_scan_position["line"] - 1) * self.max_columns_per_line + self.compiler_scan_position["column"]
+            current_position = (scan_line - 1) * self.max_columns_per_line + scan_column
             progress = min(100.0, (current_position / total_positions) * 100)
             
             # Estimate time remaining
@@ -213,62 +357,150 @@ class GameState:
         
         return {
             "scan_status": {
-                "current_line": self.compiler_scan_position["line"],
-                "current_column": self.compiler_scan_position["column"],
-                "is_active": self.compiler_scan_active,
+                "current_line": scan_line,
+                "current_column": scan_column,
+                "is_active": self._scan_active,
                 "scan_speed": self.scan_speed,
                 "progress_percentage": progress,
                 "estimated_time_remaining": time_remaining
             },
-            "game_active": self.compiler_scan_active and not game_over,
+            "game_active": self._scan_active and not game_over,
+            "time_elapsed": elapsed_time,
+            "game_over": game_over
+        }
+    
+    def _get_analytic_scan_status(self) -> Dict:
+        """Scan status computed in constant time from the game clock, without mutating state"""
+        now = time.time()
+        index, active = self._analytic_scan(now)
+        position = self._index_to_position(index)
+        game_over = index >= self._scan_end_index()
+        
+        if not active:
+            progress = 100.0
+            time_remaining = 0.0
+        else:
+            total_positions = self.total_lines * self.max_columns_per_line
+            current_position = index + 1
+            progress = min(100.0, (current_position / total_positions) * 100)
+            time_remaining = (total_positions - current_position) * self.scan_speed
+        
+        elapsed_time = now - self.game_start_time if self.game_start_time else 0
+        
+        return {
+            "scan_status": {
+                "current_line": position["line"],
+                "current_column": position["column"],
+                "is_active": active,
+                "scan_speed": self.scan_speed,
+                "progress_percentage": progress,
+                "estimated_time_remaining": time_remaining
+            },
+            "game_active": active,
             "time_elapsed": elapsed_time,
             "game_over": game_over
         }
     
     def stop_compiler_scan(self) -> None:
         """Stop the compiler scan (when bug is found by player)"""
+        if self.scan_stopped_at is None:
+            self.scan_stopped_at = time.time()
         self.compiler_scan_active = False
     
+    def scan_ended_at(self) -> Optional[float]:
+        """When the game ended (stopped, or the scan reached the bug or the end), None while it runs"""
+        if self.scan_stopped_at is not None:
+            return self.scan_stopped_at
+        if self.game_start_time is None:
+            return None
+        if self.scan_mode == SCAN_MODE_ANALYTIC:
+            ended_at = self.last_scan_time + self._scan_end_index() * self.scan_speed
+            return ended_at if time.time() >= ended_at else None
+        # The step that ended a ticked scan is the last one it took
+        return None if self._scan_active else self.last_scan_time
+    
+    def evaluate_probes(self, probes: List[Tuple[int, int, Optional[float]]],
+                        tolerance_line: int = NEAR_TOLERANCE[0], tolerance_column: int = NEAR_TOLERANCE[1],
+                        radius: int = INTERFERENCE_RADIUS,
+                        max_skew: float = config.PROBE_CLOCK_SKEW) -> List[Tuple[str, int]]:
+        """Judge a batch of (line, column, client time) probes in one pass.
+        
+        The server's clock is authoritative: a batch arriving after the game
+        ended is all "late", and client times are clamped to at most
+        `max_skew` seconds before arrival, never earlier than the previous
+        batch nor later than now (missing ones count as now). Probes are
+        replayed in that order, and one made after an earlier probe of the
+        batch found the bug is "late" too. Returns (result, nearby fake
+        errors) in input order, where result is "hit", "near", "miss" or
+        "late"; fake errors are only counted for "near".
+        """
+        self.update_compiler_scan()
+        now = time.time()
+        ended_at = self.scan_ended_at()
+        if ended_at is not None and ended_at <= now:
+            return [("late", 0)] * len(probes)
+        
+        start = self.game_start_time if self.game_start_time is not None else now
+        earliest = max(now - max_skew, self.last_probe_time, start)
+        times = [now if t is None else min(max(t, earliest), now) for _, _, t in probes]
+        if times:
+            self.last_probe_time = max(times)
+        
+        bug = self._bug
+        bug_line, bug_column = bug >> _COLUMN_BITS, bug & _COLUMN_MASK
+        # Every near probe lies within the tolerance box around the bug, so one
+        # spatial query fetches all the fake errors any of them can count
+        nearby: Optional[List[Tuple[int, int]]] = None
+        results: List[Tuple[str, int]] = [("miss", 0)] * len(probes)
+        for i in sorted(range(len(probes)), key=times.__getitem__):
+            line, column, _ = probes[i]
+            if ended_at is not None and times[i] > ended_at:
+                results[i] = ("late", 0)
+            elif bug == _NO_POSITION:
+                continue
+            elif line == bug_line and column == bug_column:
+                results[i] = ("hit", 0)
+                ended_at = times[i]
+                self.scan_stopped_at = times[i]  # the player found it then, not when the batch arrived
+                self.stop_compiler_scan()
+            elif abs(line - bug_line) <= tolerance_line and abs(column - bug_column) <= tolerance_column:
+                if nearby is None:
+                    index = self.fake_error_index
+                    reach = max(tolerance_line, tolerance_column) + radius
+                    nearby = [(index.lines[j], index.columns[j]) for j in index.query(bug_line, bug_column, reach)]
+                results[i] = ("near", sum(1 for error_line, error_column in nearby
+                                          if abs(error_line - line) <= radius and abs(error_column - column) <= radius))
+        return results
+    
     def get_time_survived(self) -> float:
         """Get time survived in current game"""
         if not self.game_start_time:
             return 0.0
         return time.time() - self.game_start_time
     
-    def is_position_near_bug(self, line: int, column: int, tolerance_line: int = 2, tolerance_column: int = 5) -> bool:
+    def is_position_near_bug(self, line: int, column: int, tolerance_line: int = NEAR_TOLERANCE[0],
+                             tolerance_column: int = NEAR_TOLERANCE[1]) -> bool:
         """Check if a position is near the bug within given tolerance"""
-        if not self.bug_position:
+        if self._bug == _NO_POSITION:
             return False
         
-        line_diff = abs(line - self.bug_position["line"])
-        column_diff = abs(column - self.bug_position["column"])
+        line_diff = abs(line - (self._bug >> _COLUMN_BITS))
+        column_diff = abs(column - (self._bug & _COLUMN_MASK))
         
         return line_diff <= tolerance_line and column_diff <= tolerance_column
     
     def is_exact_bug_position(self, line: int, column: int) -> bool:
         """Check if the position is exactly where the bug is hidden"""
-        if not self.bug_position:
+        if self._bug == _NO_POSITION:
             return False
         
-        return (line == self.bug_position["line"] and 
-                column == self.bug_position["column"])
+        return line == self._bug >> _COLUMN_BITS and column == self._bug & _COLUMN_MASK
     
-    def get_nearby_fake_errors(self, line: int, column: int, radius: int = 3) -> List[Dict[str, int]]:
+    def get_nearby_fake_errors(self, line: int, column: int, radius: int = INTERFERENCE_RADIUS) -> List[Dict[str, int]]:
         """Get fake errors near a given position (used for scan interference logic)"""
-        nearby_errors = []
-        
-        for error in self.fake_errors:
-            line_diff = abs(error["line"] - line)
-            column_diff = abs(error["column"] - column)
-            
-            if line_diff <= radius and column_diff <= radius:
-                nearby_errors.append(error)
-        
-        return nearby_errors
-
-
-# Global game state instance
-game_state = GameState()
-
-# Initialize with a default bug position for testing
-game_state.set_bug_position(15, 23)
+        index = self.fake_error_index
+        return [index.position(i) for i in index.query(line, column, radius)]
+    
+    def count_nearby_fake_errors(self, line: int, column: int, radius: int = INTERFERENCE_RADIUS) -> int:
+        """Count fake errors near a given position without building dicts"""
+        return self.fake_error_index.count_near(line, column, radius)
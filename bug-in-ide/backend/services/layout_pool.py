@@ -0,0 +1,147 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import threading
+
+import config
+from services.game_state import generate_fake_errors
+from services.metrics import LAYOUT_POOL
+from services.snippet_store import Snippet, SnippetStore, snippet_store
+from services.spatial import FakeErrorIndex
+
+# How often the refill thread wakes while it has work, in seconds
+_REFILL_TICK = 0.05
+
+
+class Layout:
+    """A ready-to-play board: the bug and fake errors clamped to the snippet's real lines and columns"""
+
+    __slots__ = ("bug_position", "fake_errors")
+
+    def __init__(self, bug_position: Optional[Tuple[int, int]], fake_errors: Optional[FakeErrorIndex]):
+        self.bug_position = bug_position
+        self.fake_errors = fake_errors
+
+
+def make_layout(snippet: Snippet) -> Layout:
+    """Build a layout for `snippet` (the work a game start would otherwise do)"""
+    bug_position = snippet.random_bug_position()
+    if bug_position is None:
+        return Layout(None, None)
+    line_lengths = [len(line) for line in snippet.lines]
+    return Layout(bug_position, generate_fake_errors(*bug_position, line_lengths=line_lengths))
+
+
+class LayoutPool:
+    """Layouts generated ahead of time, one deque per snippet.
+
+    pop() takes a ready layout in O(1) and only builds one in the request
+    when the pool for that snippet has run dry. A refill thread, started on
+    first use, tops every snippet up to `size` layouts, building at most
+    `refill_rate` per second so it never competes with requests for long.
+    Layouts do not depend on difficulty, so one pool per snippet serves
+    every difficulty. Pools of snippets that are no longer loaded are
+    dropped on the next refill.
+    """
+
+    def __init__(self, store: SnippetStore, size: int = config.LAYOUT_POOL_SIZE,
+                 refill_rate: float = config.LAYOUT_POOL_REFILL_RATE):
+        self.store = store
+        self.size = size
+        self.refill_rate = refill_rate
+        # snippet content_id -> ready layouts; deque append/popleft are thread-safe
+        self._pools: Dict[str, Deque[Layout]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+        # Metrics
+        self.hits_total = 0
+        self.misses_total = 0
+        self.generated_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def pop(self, snippet: Snippet) -> Layout:
+        """A layout for `snippet`, from the pool when one is ready"""
+        if not self.enabled:
+            return make_layout(snippet)
+        self._ensure_started()
+        pool = self._pools.get(snippet.content_id)
+        try:
+            layout = pool.popleft()
+        except (AttributeError, IndexError):  # no pool yet, or empty
+            self.misses_total += 1
+            LAYOUT_POOL.inc(1, "miss")
+            self._wake.set()
+            return make_layout(snippet)
+        self.hits_total += 1
+        LAYOUT_POOL.inc(1, "hit")
+        if len(pool) < self.size:
+            self._wake.set()
+        return layout
+
+    def fill(self, budget: Optional[int] = None) -> int:
+        """Top the pools up, building at most `budget` layouts; returns how many were built"""
+        snippets: List[Snippet] = self.store.snippets
+        pools = {snippet.content_id: self._pools.get(snippet.content_id) or deque() for snippet in snippets}
+        self._pools = pools  # drops the pools of snippets that were reloaded away
+        built = 0
+        for snippet in snippets:
+            pool = pools[snippet.content_id]
+            while len(pool) < self.size and (budget is None or built < budget):
+                pool.append(make_layout(snippet))
+                built += 1
+        self.generated_total += built
+        return built
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="layout-pool", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        budget = max(1, int(self.refill_rate * _REFILL_TICK))
+        while not self._stop.is_set():
+            if self.fill(budget) >= budget:
+                self._stop.wait(_REFILL_TICK)  # more to do: pace to the refill rate
+                continue
+            # Every pool is full: sleep until a pop or a miss asks for more
+            self._wake.wait()
+            self._wake.clear()
+
+    def close(self) -> None:
+        """Stop the refill thread"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def depth(self) -> int:
+        return sum(len(pool) for pool in list(self._pools.values()))
+
+    def stats(self) -> Dict:
+        """Pool depth and hit counters"""
+        served = self.hits_total + self.misses_total
+        return {
+            "depth": self.depth,
+            "pools": len(self._pools),
+            "size": self.size,
+            "refill_rate": self.refill_rate,
+            "hits_total": self.hits_total,
+            "misses_total": self.misses_total,
+            "hit_rate": self.hits_total / served if served else 0.0,
+            "generated_total": self.generated_total
+        }
+
+
+# Global layout pool for game starts
+layout_pool = LayoutPool(snippet_store)
@@ -0,0 +1,220 @@
+from bisect import insort
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+import config
+from models.game import PlayerStats, LeaderboardEntry, UpdateStatsRequest
+
+DIFFICULTIES = ("easy", "medium", "hard")
+WINDOWS = ("all", "daily", "weekly")
+
+DAY_SECONDS = 24 * 60 * 60
+# 1970-01-01 was a Thursday; shift so weekly windows start on Monday (UTC)
+_WEEK_OFFSET = 3 * DAY_SECONDS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_stats (
+    id INTEGER PRIMARY KEY,
+    player_name TEXT NOT NULL,
+    time_survived REAL NOT NULL,
+    status TEXT NOT NULL,
+    bug_line INTEGER,
+    bug_column INTEGER,
+    difficulty TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stats_time ON player_stats (time_survived DESC);
+CREATE INDEX IF NOT EXISTS idx_stats_difficulty_time ON player_stats (difficulty, time_survived DESC);
+CREATE INDEX IF NOT EXISTS idx_stats_created ON player_stats (created_at);
+"""
+
+# (player_name, time_survived, status, bug_line, bug_column, difficulty, created_at)
+StatRow = Tuple[str, float, str, Optional[int], Optional[int], Optional[str], float]
+
+
+def window_start(window: str, timestamp: float) -> float:
+    """Start of the daily/weekly window containing `timestamp` (0 for all-time)"""
+    if window == "daily":
+        return timestamp - timestamp % DAY_SECONDS
+    if window == "weekly":
+        return timestamp - (timestamp + _WEEK_OFFSET) % (7 * DAY_SECONDS)
+    return 0.0
+
+
+def stat_row(player_stat: Union[PlayerStats, UpdateStatsRequest], created_at: Optional[float] = None) -> StatRow:
+    """Flatten a stats model into a storage row"""
+    bug_location = player_stat.bug_location or {}
+    return (
+        player_stat.player_name,
+        player_stat.time_survived,
+        player_stat.status,
+        bug_location.get("line"),
+        bug_location.get("column"),
+        player_stat.difficulty,
+        created_at if created_at is not None else time.time(),
+    )
+
+
+class _TopK:
+    """The k best (time_survived, player_name) pairs, kept sorted best-first"""
+
+    __slots__ = ("k", "entries", "_seq")
+
+    def __init__(self, k: int):
+        self.k = k
+        # (-time_survived, insertion order, player_name): ascending order is best-first
+        self.entries: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+
+    def add(self, player_name: str, time_survived: float) -> None:
+        if len(self.entries) >= self.k and -time_survived >= self.entries[-1][0]:
+            return  # not good enough to make the board
+        insort(self.entries, (-time_survived, next(self._seq), player_name))
+        if len(self.entries) > self.k:
+            self.entries.pop()
+
+    def top(self, limit: int) -> List[LeaderboardEntry]:
+        return [
+            LeaderboardEntry(player_name=name, time_survived=-negative_time)
+            for negative_time, _, name in self.entries[:limit]
+        ]
+
+
+class Leaderboard:
+    """Player stats persisted to SQLite with bounded in-memory top-k boards.
+
+    Every stat is appended to an indexed SQLite table. Boards (all-time,
+    daily and weekly, overall or per difficulty) are loaded from the index
+    the first time they are read and then updated incrementally on every
+    insert, so reads cost O(k) and memory stays bounded by the number of
+    boards times k.
+    """
+
+    def __init__(self, db_path: str = config.LEADERBOARD_DB, top_k: int = config.LEADERBOARD_TOP_K):
+        self.db_path = db_path
+        self.top_k = top_k
+        self._conn: Optional[sqlite3.Connection] = None
+        # (difficulty or None, window, window start) -> board
+        self._boards: Dict[Tuple[Optional[str], str, float], _TopK] = {}
+        self._size: Optional[int] = None  # row count, read once then kept up to date
+        self._data_version: Optional[int] = None  # changes when another connection commits
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            if self.db_path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def add_player_stats(self, player_stat: PlayerStats) -> None:
+        """Persist one player's stats and update the boards"""
+        self.add_rows([stat_row(player_stat)])
+
+    def add_rows(self, rows: Iterable[StatRow]) -> None:
+        """Persist a batch of stat rows in one transaction and update the boards"""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO player_stats (player_name, time_survived, status, bug_line,"
+                    " bug_column, difficulty, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            for row in rows:
+                self._update_boards(row)
+            if self._size is not None:
+                self._size += len(rows)
+
+    def _update_boards(self, row: StatRow) -> None:
+        player_name, time_survived, _, _, _, difficulty, created_at = row
+        stale = []
+        for key, board in self._boards.items():
+            board_difficulty, window, start = key
+            if board_difficulty is not None and board_difficulty != difficulty:
+                continue
+            row_start = window_start(window, created_at)
+            if row_start > start:
+                stale.append(key)  # a new window has begun, reload on next read
+            elif row_start == start:
+                board.add(player_name, time_survived)
+        for key in stale:
+            del self._boards[key]
+
+    def get_leaderboard(self, limit: int = 5, difficulty: Optional[str] = None,
+                        window: str = "all") -> List[LeaderboardEntry]:
+        """Top players by survival time, optionally per difficulty and daily/weekly"""
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window {window!r}")
+        if difficulty is not None and difficulty not in DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty {difficulty!r}")
+        limit = max(0, min(limit, self.top_k))
+
+        key = (difficulty, window, window_start(window, time.time()))
+        with self._lock:
+            self._sync()
+            board = self._boards.get(key)
+            if board is None:
+                board = self._load_board(*key)
+                # Drop boards for windows that have ended
+                for old_key in [k for k in self._boards if k[:2] == key[:2]]:
+                    del self._boards[old_key]
+                self._boards[key] = board
+            return board.top(limit)
+
+    def _load_board(self, difficulty: Optional[str], window: str, start: float) -> _TopK:
+        """Fill a board from the time_survived index"""
+        query = "SELECT player_name, time_survived FROM player_stats WHERE created_at >= ?"
+        params: list = [start]
+        if difficulty is not None:
+            query += " AND difficulty = ?"
+            params.append(difficulty)
+        query += " ORDER BY time_survived DESC LIMIT ?"
+        params.append(self.top_k)
+
+        board = _TopK(self.top_k)
+        for player_name, time_survived in self._connection().execute(query, params):
+            board.add(player_name, time_survived)
+        return board
+
+    def _sync(self) -> None:
+        """Forget cached boards once another worker has written to the same file"""
+        version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._boards.clear()
+            self._size = None
+
+    def count(self) -> int:
+        """Total number of stored stats"""
+        with self._lock:
+            self._sync()
+            if self._size is None:
+                self._size = self._connection().execute("SELECT COUNT(*) FROM player_stats").fetchone()[0]
+            return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._boards.clear()
+            self._size = None
+            self._data_version = None
+
+
+# Global leaderboard
+leaderboard = Leaderboard()
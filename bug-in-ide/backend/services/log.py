@@ -0,0 +1,52 @@
+"""Logging setup: leveled key=value lines with per-message rate limiting."""
+from typing import Dict, Tuple
+import logging
+import threading
+import time
+
+import config
+
+LOG_FORMAT = "ts=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `burst` records per message template through every `interval` seconds.
+
+    Records over the limit are dropped and the next record that passes
+    reports how many were suppressed, so a hot loop cannot flood stdout.
+    """
+
+    def __init__(self, burst: int = config.LOG_RATE_BURST, interval: float = config.LOG_RATE_INTERVAL):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # (logger, template) -> [window start, records in window, suppressed]
+        self._windows: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} suppressed={suppressed}"
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+def configure_logging(level: str = config.LOG_LEVEL) -> None:
+    """Send rate-limited key=value log lines to stderr"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
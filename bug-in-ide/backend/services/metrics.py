@@ -0,0 +1,225 @@
+"""In-process metrics rendered in the Prometheus text exposition format."""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from sub-millisecond routes up to slow starts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """The metric's sample lines, without the HELP and TYPE header"""
+
+
+class Counter(Metric):
+    """A monotonically increasing count, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """A value read from a callback at scrape time, or set directly"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text)
+        self._read = read
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def value(self) -> float:
+        return self._read() if self._read is not None else self._value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, optionally split by labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, read: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, help_text, read))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics recorded directly on hot paths
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "bug_ide_http_request_duration_seconds", "Time to produce an HTTP response, by route",
+    ("method", "route", "status"))
+SCAN_TICKS = registry.counter(
+    "bug_ide_scan_ticks_total", "Compiler scan steps taken across all games (rate() gives ticks/s)")
+SCAN_PROBES = registry.counter(
+    "bug_ide_scan_probes_total", "scan-bug-position results", ("result",))
+LAYOUT_POOL = registry.counter(
+    "bug_ide_layout_pool_total", "Game starts served from the layout pool (hit) or built in the request (miss)",
+    ("result",))
+RATE_LIMITED = registry.counter(
+    "bug_ide_rate_limited_total", "Requests turned away by admission control", ("reason",))
+SCHEDULER_LAG = registry.histogram(
+    "bug_ide_scan_scheduler_lag_seconds", "How late the scan scheduler ran a due step",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+
+
+# Scope key where the rate limiter records which budget turned a request away
+REJECTED_BY = "bug_ide.rejected_by"
+
+
+def route_label(scope) -> str:
+    """Route template for a handled request, e.g. /api/snippets/{snippet_id}.
+
+    Requests the rate limiter turned away never reach routing and are
+    labelled with the name of the budget that rejected them.
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return scope.get(REJECTED_BY, "unmatched")
+    static_part = template.split("{", 1)[0]
+    path = scope["path"]
+    if not path.startswith(static_part):
+        # Some FastAPI versions report the route as declared on its router,
+        # without the prefix it was included under
+        index = path.find(static_part)
+        if index > 0:
+            template = path[:index] + template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template.
+
+    Written against raw ASGI so it adds no per-request task or body
+    buffering, and streamed responses pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_holder = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, scope["method"], route_label(scope),
+                                    str(status_holder[0]))
@@ -0,0 +1,196 @@
+"""Opt-in per-request profiling with a ring buffer of recent profiles.
+
+Nothing here is imported or installed unless BUG_IDE_PROFILE_ENABLED is set,
+so the disabled path costs nothing.
+
+Handlers run on the event loop together with every other in-flight
+request, so a profile cannot isolate one request: it records what the
+whole process did while that request was being handled. The profiles are
+most telling when the server is otherwise quiet, e.g. a trigger-header
+request against a staging instance.
+"""
+from collections import Counter as CounterDict, deque
+from typing import Deque, Dict, List, Optional
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import secrets
+import sys
+import tempfile
+import threading
+import time
+
+import config
+
+PROFILER_SAMPLE = "sample"
+PROFILER_CPROFILE = "cprofile"
+
+# Frames from these files mean a thread is parked, not working
+_IDLE_FILES = tuple(os.path.join("lib", "python3.{}".format(sys.version_info[1]), name) for name in (
+    "threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py")
+))
+
+
+class StackSampler:
+    """Statistical profiler: periodically records every busy thread's stack.
+
+    Samples are process-wide: the event loop (all requests on it, not just
+    the profiled one) and any threadpool work it handed off. Unlike cProfile
+    it sees those threads too, and its cost is one sys._current_frames()
+    call per interval.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: "CounterDict[str]" = CounterDict()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        # Sample once straight away so even sub-interval requests leave a trace
+        while True:
+            self._sample(own_id)
+            if self._stop.wait(self.interval):
+                return
+
+    def _sample(self, own_id: int) -> None:
+        self.samples += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> bytes:
+        """Folded stacks ("frame;frame;frame count"), as read by flamegraph.pl and speedscope"""
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class ProfileStore:
+    """The most recent `capacity` profiles"""
+
+    def __init__(self, capacity: int):
+        self._profiles: Deque[Dict] = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, **record) -> None:
+        with self._lock:
+            record["id"] = next(self._ids)
+            self._profiles.append(record)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [{key: value for key, value in record.items() if key != "data"}
+                    for record in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Dict]:
+        with self._lock:
+            for record in self._profiles:
+                if record["id"] == profile_id:
+                    return record
+        return None
+
+
+class ProfilingMiddleware:
+    """Profile a random fraction of requests, or any request carrying the trigger header.
+
+    The trigger header is only honoured together with a valid X-Admin-Token,
+    and never when no admin token is configured. Only one request is
+    profiled at a time; others that would be sampled meanwhile simply run
+    unprofiled. Each profile covers the whole process for the duration of
+    its request (see the module docstring).
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = config.PROFILE_SAMPLE_RATE,
+                 header: str = config.PROFILE_HEADER, profiler: str = config.PROFILER,
+                 interval: float = config.PROFILE_INTERVAL, admin_token: Optional[str] = config.ADMIN_TOKEN):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.profiler = profiler
+        self.interval = interval
+        self.admin_token = admin_token.encode("latin-1") if admin_token else None
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if self.admin_token is None:
+            return False  # anonymous clients must not be able to switch profiling on
+        headers = dict(scope.get("headers", ()))
+        return self.header in headers and secrets.compare_digest(headers.get(b"x-admin-token", b""),
+                                                                 self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            if self.profiler == PROFILER_CPROFILE:
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    profile.disable()
+                data, media_type = marshal.dumps(_pstats_dict(profile)), "application/octet-stream"
+            else:
+                sampler = StackSampler(self.interval)
+                sampler.start()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    sampler.stop()
+                data, media_type = sampler.collapsed(), "text/plain"
+        finally:
+            self._busy.release()
+
+        self.store.add(method=scope["method"], path=scope["path"], started=started,
+                       duration_s=time.perf_counter() - start, profiler=self.profiler,
+                       media_type=media_type, size=len(data), data=data)
+
+
+def _pstats_dict(profile: cProfile.Profile) -> Dict:
+    """Raw pstats data, loadable with pstats.Stats(path) once written to a file"""
+    profile.create_stats()
+    return profile.stats
+
+
+def summarize(record: Dict, limit: int = 30) -> str:
+    """Human-readable top functions for a cProfile record"""
+    with tempfile.NamedTemporaryFile(suffix=".pstats", delete=False) as f:
+        f.write(record["data"])
+        path = f.name
+    try:
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    finally:
+        os.remove(path)
+
+
+# Profiles captured by the middleware
+profile_store = ProfileStore(config.PROFILE_BUFFER_SIZE)
@@ -0,0 +1,221 @@
+"""Admission control for the API: token buckets and a concurrency cap.
+
+Every /api/ request takes a token from its client's bucket for the route,
+and requests that act on one game also take one from that game's bucket,
+so neither a noisy client nor a scripted game can crowd out everyone else.
+An empty bucket answers 429 with Retry-After set to when the next token
+arrives. Independently, once MAX_CONCURRENT_REQUESTS are in flight new
+requests are shed with 503 straight away rather than queueing behind the
+ones already running, which is what keeps p99 flat under overload.
+Rejections never reach routing, so their latency series are labelled with
+the budget that applied instead: the route's path, or "*" for the default.
+
+Buckets live in this process only; each worker behind the dispatcher
+enforces its own budgets. Clients are told apart by the connection's
+address, or by RATE_LIMIT_CLIENT_HEADER when a proxy sets it (the
+dispatcher's workers use its X-Real-IP).
+"""
+from math import ceil
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote_plus
+import json
+import re
+import time
+
+from starlette.responses import JSONResponse
+
+import config
+from services.metrics import RATE_LIMITED, REJECTED_BY, registry
+
+# Long-lived responses that would hold a concurrency slot for their whole life
+UNCAPPED_PATHS = ("/api/compiler-scan-stream",)
+
+# Request bodies are only parsed for a game_id up to this size
+MAX_BODY_PEEK_BYTES = 64 * 1024
+
+# A plain "game_id": "..." member, found without parsing the whole body
+_BODY_GAME_ID = re.compile(rb'"game_id"\s*:\s*"([^"\\]*)"')
+
+# Idle buckets are dropped at most this often, in seconds
+SWEEP_INTERVAL = 10.0
+
+
+class TokenBuckets:
+    """One token bucket per key, refilled lazily whenever it is used"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        # key -> [tokens, monotonic time of the last update]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, now: float) -> float:
+        """Take a token; 0 when granted, else seconds until one is available"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.burst - 1, now]
+            return 0.0
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def sweep(self, now: float) -> None:
+        """Forget buckets idle long enough to be full again (a new bucket starts full)"""
+        full_after = self.burst / self.rate
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < full_after}
+
+
+class RouteBudget:
+    """The per-client and per-game buckets of one route"""
+
+    __slots__ = ("clients", "games")
+
+    def __init__(self, limits: Sequence[float]):
+        self.clients = TokenBuckets(limits[0], limits[1])
+        self.games: Optional[TokenBuckets] = TokenBuckets(limits[2], limits[3]) if len(limits) >= 4 else None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying the budgets in config.RATE_LIMITS to /api/ requests.
+
+    Runs on the event loop only, so its counters and buckets need no locks.
+    """
+
+    def __init__(self, app, limits: Dict[str, Tuple[float, ...]] = config.RATE_LIMITS,
+                 max_concurrent: int = config.MAX_CONCURRENT_REQUESTS,
+                 client_header: str = config.RATE_LIMIT_CLIENT_HEADER):
+        self.app = app
+        self.budgets = {path: RouteBudget(route_limits) for path, route_limits in limits.items()}
+        self.default_budget = self.budgets.get("*")
+        self.max_concurrent = max_concurrent
+        self.client_header = client_header.lower().encode("latin-1")
+        self.in_flight = 0
+        self._last_sweep = time.monotonic()
+        registry.gauge("bug_ide_requests_in_flight", "API requests currently being handled",
+                       lambda: self.in_flight)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        capped = self.max_concurrent > 0 and path not in UNCAPPED_PATHS
+        if capped and self.in_flight >= self.max_concurrent:
+            RATE_LIMITED.inc(1, "concurrency")
+            await _reject(scope, receive, send, self.budget_name(path), 503, "Server busy, retry later", 1.0)
+            return
+
+        budget = self.budgets.get(path, self.default_budget)
+        if budget is not None:
+            now = time.monotonic()
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._sweep(now)
+            wait = budget.clients.take(self.client_of(scope), now)
+            if wait:
+                RATE_LIMITED.inc(1, "client")
+                await _reject(scope, receive, send, self.budget_name(path), 429, "Too many requests", wait)
+                return
+            if budget.games is not None:
+                game_id, receive = await _game_id_of(scope, receive)
+                if game_id is not None:
+                    wait = budget.games.take(game_id, now)
+                    if wait:
+                        RATE_LIMITED.inc(1, "game")
+                        await _reject(scope, receive, send, self.budget_name(path), 429,
+                                      "Too many requests for this game", wait)
+                        return
+
+        if not capped:
+            await self.app(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def budget_name(self, path: str) -> str:
+        """The route's own budget when it has one, else "*" for the default"""
+        return path if path in self.budgets else "*"
+
+    def client_of(self, scope) -> str:
+        """The client's address, from the configured proxy header when there is one"""
+        if self.client_header:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    return value.decode("latin-1").split(",", 1)[0].strip()
+        client = scope.get("client")
+        return client[0] if client else ""
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        for budget in self.budgets.values():
+            budget.clients.sweep(now)
+            if budget.games is not None:
+                budget.games.sweep(now)
+
+
+async def _reject(scope, receive, send, budget_name: str, status_code: int, detail: str,
+                  retry_after: float) -> None:
+    scope[REJECTED_BY] = budget_name  # read by metrics.route_label
+    response = JSONResponse({"detail": detail}, status_code=status_code,
+                            headers={"Retry-After": str(max(1, ceil(retry_after)))})
+    await response(scope, receive, send)
+
+
+async def _game_id_of(scope, receive):
+    """game_id from the query string, else from a small JSON body (which is then replayed)"""
+    query = scope.get("query_string", b"")
+    if b"game_id=" in query:
+        for field in query.split(b"&"):
+            if field.startswith(b"game_id="):
+                return unquote_plus(field[8:].decode("latin-1")), receive
+    if scope["method"] != "POST":
+        return None, receive
+
+    messages = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return None, _replay(messages, receive)  # disconnected; let the route see it
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+        if size > MAX_BODY_PEEK_BYTES:
+            return None, _replay(messages, receive)  # too big to peek at; the route still reads it all
+
+    body = b"".join(message.get("body", b"") for message in messages)
+    game_id = None
+    match = _BODY_GAME_ID.search(body)
+    if match is not None:
+        game_id = match.group(1).decode("utf-8", "replace")
+    elif b'"game_id"' in body:  # escaped or unusual JSON: parse it properly
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and isinstance(payload.get("game_id"), str):
+            game_id = payload["game_id"]
+    return game_id, _replay([{"type": "http.request", "body": body, "more_body": False}], receive)
+
+
+def _replay(messages: List[dict], receive):
+    """A receive() that hands back the messages already read, then continues from the client"""
+    messages = list(messages)
+
+    async def replayed_receive():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    return replayed_receive
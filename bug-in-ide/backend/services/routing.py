@@ -0,0 +1,31 @@
+from typing import Optional
+import uuid
+import zlib
+
+import config
+
+# game_id layout: "<shard>-<uuid4>", e.g. "3-0b9c...". Ids without a shard
+# prefix (or from a shard that no longer exists) fall back to a stable hash.
+_SHARD_SEPARATOR = "-"
+_MAX_SHARD_DIGITS = 4
+
+
+def new_game_id(shard: int = config.WORKER_INDEX) -> str:
+    """Mint a game_id that routes back to `shard`"""
+    return f"{shard}{_SHARD_SEPARATOR}{uuid.uuid4()}"
+
+
+def shard_of(game_id: str) -> Optional[int]:
+    """Shard encoded in a game_id, or None for ids minted without one"""
+    prefix, separator, _ = game_id.partition(_SHARD_SEPARATOR)
+    if not separator or not prefix.isdigit() or len(prefix) > _MAX_SHARD_DIGITS:
+        return None
+    return int(prefix)
+
+
+def pick_worker(game_id: str, worker_count: int) -> int:
+    """Index of the worker that owns a game"""
+    shard = shard_of(game_id)
+    if shard is not None and shard < worker_count:
+        return shard
+    return zlib.crc32(game_id.encode("utf-8")) % worker_count
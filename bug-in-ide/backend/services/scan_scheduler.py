@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from services.metrics import SCHEDULER_LAG
+from services.state_backend import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+# A step that raised is retried this many seconds later...
+ADVANCE_RETRY_DELAY = 0.5
+# ...and the game is dropped from the schedule after this many failures in a row
+MAX_ADVANCE_FAILURES = 5
+
+
+class ScanScheduler:
+    """Drives every session's compiler scan from a single deadline heap.
+
+    The loop sleeps until the earliest pending deadline (or forever when no
+    game is running) and advances only the sessions that are due, so idle
+    CPU is zero and each scan step lands on time. Each worker only schedules
+    the games it started, so a shared backend never sees two clocks per game.
+    """
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[str, float] = {}  # latest deadline per game, older heap entries are stale
+        self._failures: Dict[str, int] = {}  # consecutive failed steps per game
+        self._counter = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_lag: float = 0.0  # how late the most recent step ran, in seconds
+
+    @property
+    def pending(self) -> int:
+        """Number of games waiting for their next scan step"""
+        return len(self._deadlines)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Attach to the running event loop; the loop task itself starts with the first game"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+    async def stop(self) -> None:
+        """Cancel the scheduler task and forget pending deadlines"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._loop = None
+        self._heap.clear()
+        self._deadlines.clear()
+        self._failures.clear()
+
+    def schedule(self, game_id: str, deadline: float) -> None:
+        """Ask for a game's scan to be advanced at `deadline` (safe from any thread)"""
+        if self._loop is None:
+            # Not attached to a loop: scans still advance whenever their status is read
+            return
+        self._loop.call_soon_threadsafe(self._push, game_id, deadline)
+
+    def _push(self, game_id: str, deadline: float) -> None:
+        if not self.running:
+            self._start_task()
+        self._deadlines[game_id] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), game_id))
+        # Only wake the loop if this deadline is now the earliest one
+        if self._heap[0][2] == game_id:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            await self._advance_due(time.time())
+
+    async def _advance_due(self, now: float) -> None:
+        """Advance every session whose deadline has passed and reschedule it"""
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, game_id = heapq.heappop(self._heap)
+            if self._deadlines.get(game_id) != deadline:
+                continue  # superseded by a later schedule() call
+            del self._deadlines[game_id]
+
+            self.last_lag = now - deadline
+            SCHEDULER_LAG.observe(self.last_lag)
+            try:
+                next_deadline = await self.backend.advance_scan_async(game_id)
+            except Exception:
+                self._advance_failed(game_id)
+                continue
+            self._failures.pop(game_id, None)
+            if next_deadline is not None:  # None once the game is over or evicted
+                self._push(game_id, next_deadline)
+
+    def _start_task(self) -> None:
+        self._task = self._loop.create_task(self._run())
+        self._task.add_done_callback(self._task_done)
+
+    def _advance_failed(self, game_id: str) -> None:
+        """Log a step that raised and retry it shortly, or give up on the game"""
+        failures = self._failures.get(game_id, 0) + 1
+        if failures >= MAX_ADVANCE_FAILURES:
+            self._failures.pop(game_id, None)
+            logger.exception("event=scan_advance_failed game_id=%s failures=%d action=dropped", game_id, failures)
+            return
+        self._failures[game_id] = failures
+        logger.exception("event=scan_advance_failed game_id=%s failures=%d action=retry", game_id, failures)
+        self._push(game_id, time.time() + ADVANCE_RETRY_DELAY)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error("event=scan_scheduler_died pending=%d", len(self._deadlines), exc_info=error)
+            if self._task is task and self._heap:
+                self._start_task()  # keep the games still waiting scanning
+
+
+# Global scheduler driving this worker's sessions
+scan_scheduler = ScanScheduler(state_backend)
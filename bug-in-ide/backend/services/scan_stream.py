@@ -0,0 +1,63 @@
+from typing import AsyncIterator, Callable, Awaitable, Optional, Tuple
+import asyncio
+import json
+import time
+
+import config
+from services.game_state import GameState
+from services.state_backend import StateBackend
+
+
+def _read_scan(state: Optional[GameState]) -> Optional[Tuple[dict, float]]:
+    if state is None:
+        return None
+    return state.update_compiler_scan(), state.next_scan_time
+
+
+def _scan_delta(status: dict) -> dict:
+    """Compact event payload: l/c = scan line/column, p = progress, a = active, o = game over"""
+    scan = status["scan_status"]
+    return {
+        "l": scan["current_line"],
+        "c": scan["current_column"],
+        "p": round(scan["progress_percentage"], 1),
+        "a": status["game_active"],
+        "o": status.get("game_over", False),
+    }
+
+
+async def scan_events(backend: StateBackend, game_id: str,
+                      is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """Server-Sent Events for one game's compiler scan.
+
+    An event is only emitted when the scan moves or the game ends. Each
+    connection runs its own generator and always reports the latest
+    snapshot, so a slow client skips positions it had no time to receive
+    instead of holding anything up for other clients.
+    """
+    last_sent: Optional[Tuple[int, int, bool]] = None
+    last_write = time.monotonic()
+
+    while not await is_disconnected():
+        snapshot = await backend.run(game_id, _read_scan, write=False)
+        if snapshot is None:
+            return  # evicted while streaming
+        status, next_scan_time = snapshot
+
+        delta = _scan_delta(status)
+        key = (delta["l"], delta["c"], delta["a"])
+        if key != last_sent:
+            last_sent = key
+            last_write = time.monotonic()
+            yield f"data: {json.dumps(delta, separators=(',', ':'))}\n\n"
+        elif time.monotonic() - last_write >= config.STREAM_KEEPALIVE_SECONDS:
+            # Comment line keeps proxies from closing an idle connection
+            last_write = time.monotonic()
+            yield ": keepalive\n\n"
+
+        if not status["game_active"]:
+            return
+
+        # Sleep until the scan is due to move again
+        delay = next_scan_time - time.time()
+        await asyncio.sleep(min(max(delay, 0.0), config.STREAM_KEEPALIVE_SECONDS))
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import threading
+import time
+
+import config
+from services.game_state import GameState
+
+
+class SessionRegistry:
+    """Holds one GameState per game_id with idle eviction and an LRU cap"""
+
+    def __init__(self, ttl_seconds: float = config.SESSION_TTL_SECONDS,
+                 max_sessions: int = config.MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # Ordered by last access: least recently used sessions sit at the front
+        self._sessions: "OrderedDict[str, GameState]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def add(self, game_id: str, state: GameState) -> None:
+        """Register an already prepared session"""
+        now = time.time()
+        with self._lock:
+            self._sessions[game_id] = state
+            self._last_access[game_id] = now
+            self._sessions.move_to_end(game_id)
+            self._evict(now)
+
+    def get(self, game_id: str) -> Optional[GameState]:
+        """Look up a session and mark it as recently used"""
+        now = time.time()
+        with self._lock:
+            state = self._sessions.get(game_id)
+            if state is None:
+                return None
+            if now - self._last_access[game_id] > self.ttl_seconds:
+                self._drop(game_id)
+                return None
+            self._last_access[game_id] = now
+            self._sessions.move_to_end(game_id)
+            return state
+
+    def peek(self, game_id: str) -> Optional[GameState]:
+        """Look up a session without refreshing its idle timer"""
+        with self._lock:
+            return self._sessions.get(game_id)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired sessions from the LRU end, then enforce the size cap"""
+        while self._sessions:
+            oldest_id = next(iter(self._sessions))
+            if now - self._last_access[oldest_id] <= self.ttl_seconds:
+                break
+            self._drop(oldest_id)
+        while len(self._sessions) > self.max_sessions:
+            oldest_id = next(iter(self._sessions))
+            self._drop(oldest_id)
+
+    def _drop(self, game_id: str) -> None:
+        self._sessions.pop(game_id, None)
+        self._last_access.pop(game_id, None)
@@ -0,0 +1,244 @@
+"""Headless Monte Carlo simulation of games, for tuning difficulty.
+
+Plays many games at once as NumPy arrays, using the same rules as GameState:
+the bug sits on a real character of the snippet, 8-15 fake errors are
+scattered around it, the compiler scan advances one column every
+SCAN_SPEEDS[difficulty] seconds and catches the player when it reaches the
+bug, and a probe near the bug reports it with detection_chance(fake errors
+near that probe). A player strategy decides where probes go:
+
+    random  probe a uniformly random character each time, no memory
+    sweep   probe every character in reading order, racing the scan
+    hunter  probe at random until a near probe reports the bug, then search
+            the tolerance box around that probe
+
+Survival is the time until the player hits the bug (escaped) or the scan
+reaches it (caught). Run from the backend directory (needs numpy, see
+requirements-dev.txt):
+
+    python -m services.simulation --games 1000000
+    python -m services.simulation --processes 8 --strategy hunter --json sim.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # optional: only this module needs it
+except ImportError:
+    np = None
+
+from services.game_state import (
+    FAKE_ERROR_COUNT, FAKE_ERROR_SPREAD, INTERFERENCE_RADIUS, NEAR_TOLERANCE, SCAN_SPEEDS, GameState,
+    detection_chance
+)
+from services.snippet_store import Snippet, SnippetStore
+
+STRATEGIES = ("random", "sweep", "hunter")
+SCAN_COLUMNS = GameState().max_columns_per_line  # scan width used by start_new_game
+
+
+class SnippetModel:
+    """A snippet's bug candidates and the per-candidate counts the simulation needs"""
+
+    def __init__(self, filename: str, line_lengths: Sequence[int], candidates: Sequence[int]):
+        self.filename = filename
+        self.line_count = len(line_lengths)
+        # Longest column a fake error may sit on, per line (index 0 = line 1)
+        self.line_limits = np.maximum(1, np.asarray(line_lengths, dtype=np.int64))
+        packed = np.asarray(candidates, dtype=np.int64)
+        self.lines = packed >> 16
+        self.columns = packed & 0xFFFF
+        # Whether each position is a candidate, shifted by NEAR_TOLERANCE so
+        # every position in a candidate's tolerance box has a cell
+        tolerance_line, tolerance_column = NEAR_TOLERANCE
+        self.candidate_grid = np.zeros((self.lines.max() + 2 * tolerance_line + 2,
+                                        self.columns.max() + 2 * tolerance_column + 2), dtype=np.int32)
+        self.candidate_grid[self.lines + tolerance_line, self.columns + tolerance_column] = 1
+        self.box_counts = self._box_counts()
+
+    @classmethod
+    def from_snippet(cls, snippet: Snippet) -> "SnippetModel":
+        return cls(snippet.filename, [len(line) for line in snippet.lines], snippet.bug_candidates)
+
+    def _box_counts(self) -> "np.ndarray":
+        """Candidates inside the near-tolerance box around each candidate (2-D prefix sums)"""
+        tolerance_line, tolerance_column = NEAR_TOLERANCE
+        grid = self.candidate_grid
+        prefix = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1), dtype=np.int32)
+        prefix[1:, 1:] = grid.cumsum(0).cumsum(1)
+        top, bottom = self.lines, self.lines + 2 * tolerance_line + 1
+        left, right = self.columns, self.columns + 2 * tolerance_column + 1
+        return prefix[bottom, right] - prefix[top, right] - prefix[bottom, left] + prefix[top, left]
+
+
+def simulate(model: SnippetModel, difficulty: str, strategy: str, games: int,
+             probe_rate: float = 2.0, seed: Optional[int] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Play `games` games; returns (survival seconds, escaped) arrays"""
+    if np is None:
+        raise RuntimeError("The simulation needs numpy: pip install -r requirements-dev.txt")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}")
+    rng = np.random.default_rng(seed)
+    candidate_count = len(model.lines)
+    probe_interval = 1.0 / probe_rate
+
+    # Bug placement: uniform over real characters, like Snippet.random_bug_position
+    bug = rng.integers(0, candidate_count, games)
+    bug_line, bug_column = model.lines[bug], model.columns[bug]
+
+    # The scan reaches the bug after this many steps (GameState._scan_end_index)
+    end_index = np.minimum(model.line_count * SCAN_COLUMNS,
+                           (bug_line - 1) * SCAN_COLUMNS + np.minimum(bug_column, SCAN_COLUMNS + 1) - 1)
+    caught_at = np.maximum(end_index, 1) * SCAN_SPEEDS[difficulty]
+
+    if strategy == "random":
+        probes = rng.geometric(1.0 / candidate_count, games)
+    elif strategy == "sweep":
+        probes = bug + 1  # candidates are in reading order
+    else:
+        probes = _hunter_probes(model, rng, bug, bug_line, bug_column)
+
+    escape_at = probes * probe_interval
+    escaped = escape_at < caught_at
+    survival = np.where(escaped, escape_at, caught_at).astype(np.float32)
+    return survival, escaped
+
+
+def _hunter_probes(model: SnippetModel, rng, bug, bug_line, bug_column) -> "np.ndarray":
+    games = len(bug)
+    candidate_count = len(model.lines)
+
+    # Fake errors, as in generate_fake_errors: clamped onto real lines and columns
+    low, high = FAKE_ERROR_COUNT
+    line_spread, column_spread = FAKE_ERROR_SPREAD
+    count = rng.integers(low, high + 1, games)
+    slot = np.arange(high)[None, :] < count[:, None]
+    fake_line = np.clip(bug_line[:, None] + rng.integers(-line_spread, line_spread + 1, (games, high)),
+                        1, model.line_count)
+    fake_column = np.minimum(
+        np.maximum(1, bug_column[:, None] + rng.integers(-column_spread, column_spread + 1, (games, high))),
+        model.line_limits[fake_line - 1])
+    on_bug = (fake_line == bug_line[:, None]) & (fake_column == bug_column[:, None])
+    placed = slot & ~on_bug
+
+    # Like api/game.py, a near probe counts the fake errors around itself, so
+    # each candidate in the tolerance box around the bug has its own odds.
+    # Fake errors near each probe = (errors near the probe's line) x (errors
+    # near its column), one batched matrix product over the whole box.
+    tolerance_line, tolerance_column = NEAR_TOLERANCE
+    line_offsets = np.arange(-tolerance_line, tolerance_line + 1)
+    column_offsets = np.arange(-tolerance_column, tolerance_column + 1)
+    line_from_bug = (fake_line - bug_line[:, None])[:, None, :]
+    column_from_bug = (fake_column - bug_column[:, None])[:, :, None]
+    near_line = np.abs(line_from_bug - line_offsets[None, :, None]) <= INTERFERENCE_RADIUS
+    near_column = np.abs(column_from_bug - column_offsets[None, None, :]) <= INTERFERENCE_RADIUS
+    nearby = np.matmul((near_line & placed[:, None, :]).astype(np.float32), near_column.astype(np.float32))
+    odds = np.array([detection_chance(k) for k in range(high + 1)])[nearby.astype(np.int64)]
+    real = model.candidate_grid[(bug_line + tolerance_line)[:, None, None] + line_offsets[None, :, None],
+                                (bug_column + tolerance_column)[:, None, None] + column_offsets[None, None, :]]
+    real[:, tolerance_line, tolerance_column] = 0  # the bug itself is a hit, not a near probe
+    detect_sum = (real * odds).sum(axis=(1, 2))
+
+    # Phase 1: random probes until one hits the bug or a near probe reports it
+    box = model.box_counts[bug]
+    p_hit = 1.0 / candidate_count
+    p_event = p_hit + detect_sum / candidate_count
+    probes = rng.geometric(p_event)
+    # Phase 2 (unless the event was a direct hit): search the box without repeats
+    searching = rng.random(games) >= p_hit / p_event
+    probes += np.where(searching, rng.integers(1, box + 1), 0)
+    return probes
+
+
+def summarize(survival: "np.ndarray", escaped: "np.ndarray", bins: int) -> Dict:
+    edges = np.linspace(0.0, float(survival.max()) or 1.0, bins + 1)
+    counts, _ = np.histogram(survival, bins=edges)
+    p50, p90 = np.percentile(survival, (50, 90))
+    return {
+        "games": int(len(survival)),
+        "escape_rate": float(escaped.mean()),
+        "mean_s": float(survival.mean()),
+        "p50_s": float(p50),
+        "p90_s": float(p90),
+        "histogram": {"edges_s": edges.round(2).tolist(), "counts": counts.tolist()}
+    }
+
+
+def _run_chunk(task: Tuple) -> Tuple[Tuple[str, str, str], "np.ndarray", "np.ndarray"]:
+    model, difficulty, strategy, games, probe_rate, seed = task
+    survival, escaped = simulate(model, difficulty, strategy, games, probe_rate, seed)
+    return (model.filename, difficulty, strategy), survival, escaped
+
+
+def run(models: List[SnippetModel], difficulties: Sequence[str], strategies: Sequence[str],
+        games: int, probe_rate: float, processes: int, bins: int, seed: int,
+        chunk_size: int = 250_000) -> List[Dict]:
+    """Simulate every (snippet, difficulty, strategy), spread over `processes` when > 1"""
+    tasks = []
+    seeds = np.random.SeedSequence(seed)
+    for model in models:
+        for difficulty in difficulties:
+            for strategy in strategies:
+                for start in range(0, games, chunk_size):
+                    chunk_seed = int(seeds.spawn(1)[0].generate_state(1)[0])
+                    tasks.append((model, difficulty, strategy, min(chunk_size, games - start), probe_rate, chunk_seed))
+
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            chunks = pool.map(_run_chunk, tasks)
+    else:
+        chunks = [_run_chunk(task) for task in tasks]
+
+    grouped: Dict[Tuple[str, str, str], List] = {}
+    for key, survival, escaped in chunks:
+        grouped.setdefault(key, []).append((survival, escaped))
+    results = []
+    for (filename, difficulty, strategy), parts in grouped.items():
+        survival = np.concatenate([part[0] for part in parts])
+        escaped = np.concatenate([part[1] for part in parts])
+        results.append({"snippet": filename, "difficulty": difficulty, "strategy": strategy,
+                        **summarize(survival, escaped, bins)})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo survival-time simulation per difficulty and snippet")
+    parser.add_argument("--games", type=int, default=100_000, help="games per snippet, difficulty and strategy")
+    parser.add_argument("--difficulty", action="append", choices=sorted(SCAN_SPEEDS), help="repeatable; default all")
+    parser.add_argument("--strategy", action="append", choices=STRATEGIES, help="repeatable; default all")
+    parser.add_argument("--snippet", action="append", help="filename, repeatable; default all")
+    parser.add_argument("--probe-rate", type=float, default=2.0, help="player probes per second")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes (0 = one per core)")
+    parser.add_argument("--bins", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write every summary and histogram to this file")
+    args = parser.parse_args()
+
+    store = SnippetStore()
+    store.load()
+    snippets = [s for s in store.snippets if not args.snippet or s.filename in args.snippet]
+    models = [SnippetModel.from_snippet(snippet) for snippet in snippets]
+    processes = args.processes or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    results = run(models, args.difficulty or list(SCAN_SPEEDS), args.strategy or list(STRATEGIES),
+                  args.games, args.probe_rate, processes, args.bins, args.seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'snippet':<20}{'difficulty':<12}{'strategy':<9}{'escape':>8}{'mean s':>9}{'p50 s':>9}{'p90 s':>9}")
+    for result in results:
+        print(f"{result['snippet']:<20}{result['difficulty']:<12}{result['strategy']:<9}"
+              f"{result['escape_rate']:>8.1%}{result['mean_s']:>9.1f}{result['p50_s']:>9.1f}{result['p90_s']:>9.1f}")
+    total = sum(result["games"] for result in results)
+    print(f"{total:,} games in {elapsed:.1f} s ({total / elapsed:,.0f} games/s, {processes} process(es))")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
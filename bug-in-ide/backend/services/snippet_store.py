@@ -0,0 +1,172 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+import config
+
+try:
+    import brotli  # optional: enables a br-encoded variant of each snippet body
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+# Bugs hide on a real character within the first columns of a line
+BUG_MAX_COLUMN = 50
+
+
+class Snippet:
+    """A code snippet with the metadata needed to start a game precomputed"""
+
+    __slots__ = ("id", "language", "filename", "lines", "data",
+                 "line_count", "max_line_length", "_bug_candidates",
+                 "json_body", "gzip_body", "brotli_body", "content_id", "etag")
+
+    def __init__(self, snippet_id: int, data: Dict):
+        self.id = snippet_id
+        self.data = data
+        self.language: str = data["language"]
+        self.filename: str = data["filename"]
+        self.lines: List[str] = data["lines"]
+        self.line_count = len(self.lines)
+        self.max_line_length = max((len(line) for line in self.lines), default=0)
+
+        # Every non-blank character a bug may sit on, packed as (line << 16) | column
+        candidates = array("I")
+        for line_number, line in enumerate(self.lines, start=1):
+            for column, char in enumerate(line[:BUG_MAX_COLUMN], start=1):
+                if not char.isspace():
+                    candidates.append((line_number << 16) | column)
+        self._bug_candidates = candidates
+
+        # The CodeSnippetResponse payload never changes, so encode it once and
+        # splice the bytes into responses; the hash doubles as a stable id
+        self.json_body: bytes = json.dumps({
+            "lines": self.lines,
+            "language": self.language,
+            "filename": self.filename,
+            "total_lines": self.line_count
+        }, separators=(",", ":")).encode("utf-8")
+        self.gzip_body: bytes = gzip.compress(self.json_body, compresslevel=9, mtime=0)
+        self.brotli_body: Optional[bytes] = brotli.compress(self.json_body) if brotli else None
+        self.content_id: str = hashlib.sha256(self.json_body).hexdigest()[:20]
+        self.etag = f'"{self.content_id}"'
+
+    @property
+    def bug_candidates(self) -> array:
+        """Packed positions a bug may be placed on, in reading order (do not modify)"""
+        return self._bug_candidates
+
+    @property
+    def bug_candidate_count(self) -> int:
+        return len(self._bug_candidates)
+
+    def random_bug_position(self) -> Optional[Tuple[int, int]]:
+        """Pick a (line, column) on a real character in O(1)"""
+        if self._bug_candidates:
+            packed = self._bug_candidates[random.randrange(len(self._bug_candidates))]
+            return packed >> 16, packed & 0xFFFF
+        if self.line_count:
+            return random.randint(1, self.line_count), 1
+        return None
+
+
+class SnippetStore:
+    """snippets.json parsed once and indexed by language and filename.
+
+    The file's mtime is checked at most every `reload_interval` seconds and
+    the store is rebuilt when it changes, so edits are picked up without a
+    restart while game starts never touch the disk.
+    """
+
+    def __init__(self, path: str = os.path.join(STATIC_DIR, "snippets.json"),
+                 reload_interval: float = config.SNIPPET_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.snippets: List[Snippet] = []
+        self.by_language: Dict[str, List[Snippet]] = {}
+        self.by_filename: Dict[str, Snippet] = {}
+        self.by_content_id: Dict[str, Snippet] = {}
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        self._ensure_fresh()
+        return len(self.snippets)
+
+    def load(self) -> None:
+        """Read and index the snippets file (raises FileNotFoundError if missing)"""
+        with self._lock:
+            self._load()
+
+    def _load(self) -> None:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r") as f:
+            raw = json.load(f)
+
+        snippets = [Snippet(index, data) for index, data in enumerate(raw)]
+        by_language: Dict[str, List[Snippet]] = {}
+        for snippet in snippets:
+            by_language.setdefault(snippet.language, []).append(snippet)
+
+        # Swap the indexes in one go so readers never see a half-built store
+        self.snippets, self.by_language = snippets, by_language
+        self.by_filename = {snippet.filename: snippet for snippet in snippets}
+        self.by_content_id = {snippet.content_id: snippet for snippet in snippets}
+        self._mtime = mtime
+        self._last_check = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        """Load on first use and reload when the file changed on disk"""
+        if self._mtime is not None and time.monotonic() - self._last_check < self.reload_interval:
+            return
+        with self._lock:
+            if self._mtime is None:
+                self._load()
+                return
+            if time.monotonic() - self._last_check < self.reload_interval:
+                return
+            self._last_check = time.monotonic()
+            try:
+                changed = os.stat(self.path).st_mtime != self._mtime
+            except FileNotFoundError:
+                return  # keep serving what we have
+            if changed:
+                self._load()
+
+    async def refresh(self) -> None:
+        """The freshness check for event-loop callers: loading or stat-ing the file happens on the threadpool"""
+        if self._mtime is not None and time.monotonic() - self._last_check < self.reload_interval:
+            return
+        await run_in_threadpool(self._ensure_fresh)
+
+    def random(self, language: Optional[str] = None) -> Snippet:
+        """Pick a random snippet, optionally restricted to one language"""
+        self._ensure_fresh()
+        pool = self.by_language.get(language, []) if language else self.snippets
+        if not pool:
+            raise KeyError(f"No snippets for language {language!r}" if language else "No snippets loaded")
+        return pool[random.randrange(len(pool))]
+
+    def get_by_content_id(self, content_id: str) -> Optional[Snippet]:
+        """Look up a snippet by the hash of its encoded content"""
+        self._ensure_fresh()
+        return self.by_content_id.get(content_id)
+
+    def get_by_filename(self, filename: str) -> Optional[Snippet]:
+        """Look up a snippet by its filename"""
+        self._ensure_fresh()
+        return self.by_filename.get(filename)
+
+
+# Global snippet store
+snippet_store = SnippetStore()
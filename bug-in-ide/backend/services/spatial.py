@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Side of a grid cell in lines/columns; with the default scan radius of 3
+# a query touches at most 2x2 cells
+CELL_SIZE = 8
+
+# Below this many errors a straight pass over the arrays beats the grid
+GRID_MIN_ERRORS = 32
+
+# Cell coordinates packed as cell_line * _CELL_STRIDE + cell_column
+_CELL_STRIDE = 1 << 20
+
+
+class FakeErrorIndex:
+    """Immutable fake error positions in flat int arrays, bucketed on a coarse grid.
+
+    Positions are stored sorted by grid cell, with one sorted array of
+    occupied cell keys and one of offsets into the position arrays. Radius
+    queries only visit the cells overlapping the query square, so their cost
+    follows the number of nearby errors rather than the total. Small sets
+    skip the grid and are scanned directly.
+    """
+
+    __slots__ = ("lines", "columns", "_cell_keys", "_cell_offsets", "cell_size")
+
+    def __init__(self, positions: Iterable[Tuple[int, int]] = (), cell_size: int = CELL_SIZE):
+        self.cell_size = cell_size
+        positions = list(positions)
+        self._cell_keys: Optional[array] = None
+        self._cell_offsets: Optional[array] = None
+
+        if len(positions) >= GRID_MIN_ERRORS:
+            keyed = sorted((self._cell_key(line // cell_size, column // cell_size), line, column)
+                           for line, column in positions)
+            cell_keys = array("q")
+            cell_offsets = array("i")
+            for offset, (key, _, _) in enumerate(keyed):
+                if not cell_keys or cell_keys[-1] != key:
+                    cell_keys.append(key)
+                    cell_offsets.append(offset)
+            cell_offsets.append(len(keyed))
+            self._cell_keys, self._cell_offsets = cell_keys, cell_offsets
+            positions = [(line, column) for _, line, column in keyed]
+
+        self.lines = array("i", (line for line, _ in positions))
+        self.columns = array("i", (column for _, column in positions))
+
+    @staticmethod
+    def _cell_key(cell_line: int, cell_column: int) -> int:
+        return cell_line * _CELL_STRIDE + cell_column
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def query(self, line: int, column: int, radius: int) -> List[int]:
+        """Indexes of errors within `radius` lines and columns of (line, column)"""
+        lines, columns = self.lines, self.columns
+        if self._cell_keys is None:
+            return [i for i in range(len(lines))
+                    if abs(lines[i] - line) <= radius and abs(columns[i] - column) <= radius]
+
+        size = self.cell_size
+        cell_keys, cell_offsets = self._cell_keys, self._cell_offsets
+        found = []
+        first_cell_column = (column - radius) // size
+        last_cell_column = (column + radius) // size
+        for cell_line in range((line - radius) // size, (line + radius) // size + 1):
+            # Cells of one grid row are adjacent in key order
+            low = self._cell_key(cell_line, first_cell_column)
+            high = self._cell_key(cell_line, last_cell_column)
+            cell = bisect_left(cell_keys, low)
+            while cell < len(cell_keys) and cell_keys[cell] <= high:
+                for i in range(cell_offsets[cell], cell_offsets[cell + 1]):
+                    if abs(lines[i] - line) <= radius and abs(columns[i] - column) <= radius:
+                        found.append(i)
+                cell += 1
+        return found
+
+    def count_near(self, line: int, column: int, radius: int) -> int:
+        """Number of errors within `radius` of (line, column)"""
+        return len(self.query(line, column, radius))
+
+    def position(self, index: int) -> Dict[str, int]:
+        return {"line": self.lines[index], "column": self.columns[index]}
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.lines, self.columns)
+
+    def to_dicts(self) -> List[Dict[str, int]]:
+        """All positions as {"line", "column"} dicts, for API responses"""
+        return [{"line": line, "column": column} for line, column in zip(self.lines, self.columns)]
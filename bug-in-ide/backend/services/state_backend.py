@@ -0,0 +1,289 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+import config
+from services.game_state import GameState
+from services.sessions import SessionRegistry
+from services.spatial import FakeErrorIndex
+
+BACKEND_MEMORY = "memory"
+BACKEND_SQLITE = "sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    game_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    last_access REAL NOT NULL,
+    state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+"""
+
+T = TypeVar("T")
+
+# A read only refreshes a session's idle timer once this fraction of the TTL has passed
+_TOUCH_FRACTION = 0.1
+
+
+class StateBackend(ABC):
+    """Where game sessions live.
+
+    Every access goes through session(), which hands out the GameState for
+    the duration of a `with` block: the in-process backend holds the
+    session's lock, a shared backend loads the state, serialises writers and
+    stores it again on exit. Scan clocks belong to the worker that started
+    the game; only that worker's scheduler calls advance_scan() for it.
+
+    Code on the event loop uses the async variants (run, create_async,
+    add_async, advance_scan_async). Backends whose access blocks on I/O
+    set `blocking` and have those run on the threadpool; the in-process
+    backend runs them inline, since nothing in it waits.
+    """
+
+    blocking = False
+
+    def create(self, player_name: str, code_snippet: Dict, difficulty: str = "medium",
+               bug_position: Optional[Tuple[int, int]] = None,
+               fake_errors: Optional[FakeErrorIndex] = None) -> GameState:
+        """Start a new game and register it under its game_id"""
+        state = GameState()
+        state.start_new_game(player_name, code_snippet, difficulty, bug_position, fake_errors)
+        self.add(state)
+        return state
+
+    @abstractmethod
+    def add(self, state: GameState) -> None:
+        """Register an already prepared session, owned by this worker"""
+
+    @abstractmethod
+    def session(self, game_id: str, write: bool = True) -> Iterator[Optional[GameState]]:
+        """Context manager yielding the session (None when unknown or expired).
+
+        With write=False changes made inside the block may be discarded, which
+        is fine for reads: a ticked scan catches up deterministically from the
+        stored clock.
+        """
+
+    @abstractmethod
+    def advance_scan(self, game_id: str) -> Optional[float]:
+        """Step a session's scan up to now; the next deadline, or None once it has stopped"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of live sessions"""
+
+    def close(self) -> None:
+        pass
+
+    def _run(self, game_id: str, fn: Callable[[Optional[GameState]], T], write: bool) -> T:
+        with self.session(game_id, write) as state:
+            return fn(state)
+
+    async def _call(self, fn: Callable[..., T], *args) -> T:
+        if self.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def run(self, game_id: str, fn: Callable[[Optional[GameState]], T], write: bool = True) -> T:
+        """Call fn(state) inside session() and return its result, without blocking the event loop.
+
+        `fn` must not await: it may run on a worker thread, and it holds the
+        session for as long as it runs.
+        """
+        return await self._call(self._run, game_id, fn, write)
+
+    async def create_async(self, player_name: str, code_snippet: Dict, difficulty: str = "medium",
+                           bug_position: Optional[Tuple[int, int]] = None,
+                           fake_errors: Optional[FakeErrorIndex] = None) -> GameState:
+        return await self._call(self.create, player_name, code_snippet, difficulty, bug_position, fake_errors)
+
+    async def add_async(self, state: GameState) -> None:
+        await self._call(self.add, state)
+
+    async def advance_scan_async(self, game_id: str) -> Optional[float]:
+        return await self._call(self.advance_scan, game_id)
+
+
+class MemoryBackend(StateBackend):
+    """Sessions held in this process's SessionRegistry"""
+
+    def __init__(self, registry: Optional[SessionRegistry] = None):
+        self.registry = registry if registry is not None else SessionRegistry()
+
+    def __len__(self) -> int:
+        return len(self.registry)
+
+    def add(self, state: GameState) -> None:
+        self.registry.add(state.current_game_id, state)
+
+    @contextmanager
+    def session(self, game_id: str, write: bool = True) -> Iterator[Optional[GameState]]:
+        state = self.registry.get(game_id)
+        if state is None:
+            yield None
+            return
+        with state.lock:
+            yield state
+
+    def advance_scan(self, game_id: str) -> Optional[float]:
+        state = self.registry.peek(game_id)  # the scheduler does not keep a game alive
+        if state is None:
+            return None
+        with state.lock:
+            state.update_compiler_scan()
+            return state.next_scan_time if state.compiler_scan_active else None
+
+
+class SqliteBackend(StateBackend):
+    """Sessions pickled into a SQLite file shared by every worker on the host.
+
+    Writers take the database write lock (BEGIN IMMEDIATE) for the length of
+    the `with` block, which serialises concurrent requests to the same game
+    across processes. Readers never block: WAL lets them see the last
+    committed state while a write is in progress.
+    """
+
+    blocking = True
+
+    def __init__(self, db_path: str = config.STATE_DB, worker_id: str = config.WORKER_ID,
+                 ttl_seconds: float = config.SESSION_TTL_SECONDS,
+                 max_sessions: int = config.MAX_SESSIONS):
+        self.db_path = db_path
+        self.worker_id = worker_id
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # sqlite3 connections must not be shared by threads running at the same time
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            # Transactions are managed explicitly below
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def __len__(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE last_access >= ?", (cutoff,)
+        ).fetchone()[0]
+
+    def add(self, state: GameState) -> None:
+        now = time.time()
+        blob = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (game_id, owner, last_access, state) VALUES (?, ?, ?, ?)",
+                (state.current_game_id, self.worker_id, now, blob)
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired sessions, then the least recently used ones above the cap"""
+        conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+        excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM sessions WHERE game_id IN"
+                " (SELECT game_id FROM sessions ORDER BY last_access LIMIT ?)", (excess,)
+            )
+
+    @contextmanager
+    def session(self, game_id: str, write: bool = True) -> Iterator[Optional[GameState]]:
+        conn = self._connection()
+        now = time.time()
+        if not write:
+            row = conn.execute(
+                "SELECT state, last_access FROM sessions WHERE game_id = ?", (game_id,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                yield None
+                return
+            if now - row[1] > self.ttl_seconds * _TOUCH_FRACTION:
+                conn.execute("UPDATE sessions SET last_access = ? WHERE game_id = ?", (now, game_id))
+            yield pickle.loads(row[0])
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state, last_access FROM sessions WHERE game_id = ?",
+                               (game_id,)).fetchone()
+            state = None
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                state = pickle.loads(row[0])
+            yield state
+            if state is not None:
+                conn.execute(
+                    "UPDATE sessions SET state = ?, last_access = ? WHERE game_id = ?",
+                    (pickle.dumps(state, pickle.HIGHEST_PROTOCOL), now, game_id)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def advance_scan(self, game_id: str) -> Optional[float]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Only the owning worker moves the clock; idle timers are left alone
+            row = conn.execute("SELECT state FROM sessions WHERE game_id = ? AND owner = ?",
+                               (game_id, self.worker_id)).fetchone()
+            deadline = None
+            if row is not None:
+                state = pickle.loads(row[0])
+                state.update_compiler_scan()
+                conn.execute("UPDATE sessions SET state = ? WHERE game_id = ?",
+                             (pickle.dumps(state, pickle.HIGHEST_PROTOCOL), game_id))
+                if state.compiler_scan_active:
+                    deadline = state.next_scan_time
+            conn.execute("COMMIT")
+            return deadline
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_backend(name: str = config.STATE_BACKEND) -> StateBackend:
+    """Build the state backend selected by BUG_IDE_STATE_BACKEND"""
+    if name == BACKEND_MEMORY:
+        return MemoryBackend()
+    if name == BACKEND_SQLITE:
+        return SqliteBackend()
+    raise ValueError(f"Unknown state backend {name!r}")
+
+
+# Global state backend shared by the API and the scan scheduler
+state_backend = create_backend()
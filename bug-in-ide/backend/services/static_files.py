@@ -0,0 +1,193 @@
+"""Static serving for the frontend build.
+
+The dist directory is indexed once (path, size, ETag, media type and any
+precompressed .br/.gz siblings), so requests never touch the filesystem
+metadata. Small files are served from memory; large ones go through
+FileResponse, which hands the path to the server (http.response.pathsend)
+when it supports zero-copy sends and streams in chunks otherwise.
+
+Generate the compressed siblings after `npm run build` with:
+
+    python -m services.static_files ../frontend/dist
+"""
+from email.utils import formatdate
+from typing import Dict, List, Optional, Tuple
+import gzip
+import mimetypes
+import os
+import re
+import sys
+
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+import config
+
+try:
+    import brotli  # optional: enables .br siblings
+except ImportError:
+    brotli = None
+
+# Vite names bundled assets "<name>-<hash>.<ext>"; their content never changes
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Compressed siblings, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 1024
+
+
+class StaticEntry:
+    """One servable file and its precompressed variants"""
+
+    __slots__ = ("path", "size", "media_type", "etag", "last_modified", "stat_result",
+                 "cache_control", "variants", "body")
+
+    def __init__(self, path: str, relative_path: str, stat_result: os.stat_result, inline_max: int):
+        self.path = path
+        self.size = stat_result.st_size
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.stat_result = stat_result
+        self.cache_control = IMMUTABLE_CACHE if HASHED_NAME.search(relative_path) else REVALIDATE_CACHE
+        # encoding -> (path, stat, inline body or None)
+        self.variants: Dict[str, Tuple[str, os.stat_result, Optional[bytes]]] = {}
+        self.body = _read(path) if self.size <= inline_max else None
+
+    def add_variant(self, encoding: str, path: str, stat_result: os.stat_result, inline_max: int) -> None:
+        body = _read(path) if stat_result.st_size <= inline_max else None
+        self.variants[encoding] = (path, stat_result, body)
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class StaticIndex:
+    """ASGI app serving a build directory from an in-memory index"""
+
+    def __init__(self, directory: str, inline_max: int = config.STATIC_INLINE_MAX_BYTES):
+        self.directory = directory
+        self.inline_max = inline_max
+        self.entries: Dict[str, StaticEntry] = {}
+        self._loaded = False
+
+    def load(self) -> None:
+        """(Re)build the index; call again after redeploying the build"""
+        entries: Dict[str, StaticEntry] = {}
+        siblings: List[Tuple[str, str, str]] = []
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relative_path = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                for encoding, suffix in ENCODINGS:
+                    if relative_path.endswith(suffix):
+                        siblings.append((relative_path[:-len(suffix)], encoding, path))
+                        break
+                else:
+                    entries[relative_path] = StaticEntry(path, relative_path, os.stat(path), self.inline_max)
+        for relative_path, encoding, path in siblings:
+            entry = entries.get(relative_path)
+            if entry is not None:
+                entry.add_variant(encoding, path, os.stat(path), self.inline_max)
+        self.entries = entries  # swapped in whole, requests never see a partial index
+        self._loaded = True
+
+    def lookup(self, route_path: str) -> Optional[StaticEntry]:
+        if not self._loaded:
+            self.load()
+        relative_path = route_path.lstrip("/")
+        if relative_path == "" or relative_path.endswith("/"):
+            relative_path += "index.html"
+        entry = self.entries.get(relative_path)
+        if entry is None and "." not in relative_path.rsplit("/", 1)[-1]:
+            entry = self.entries.get(relative_path + "/index.html")
+        return entry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+            return await response(scope, receive, send)
+
+        entry = self.lookup(_route_path(scope))
+        if entry is None:
+            not_found = self.entries.get("404.html")
+            if not_found is not None and not_found.body is not None:
+                response = Response(not_found.body, status_code=404, media_type="text/html")
+            else:
+                response = PlainTextResponse("Not Found", status_code=404)
+            return await response(scope, receive, send)
+
+        response = self.respond(entry, _header(scope, b"accept-encoding"), _header(scope, b"if-none-match"))
+        await response(scope, receive, send)
+
+    def respond(self, entry: StaticEntry, accept_encoding: str, if_none_match: str) -> Response:
+        """Pick the best representation and answer it, or 304 when the client has it"""
+        encoding = None
+        path, stat_result, body, etag = entry.path, entry.stat_result, entry.body, entry.etag
+        for candidate, _ in ENCODINGS:
+            if candidate in entry.variants and candidate in accept_encoding:
+                encoding = candidate
+                path, stat_result, body = entry.variants[candidate]
+                etag = f'{entry.etag[:-1]}-{candidate}"'
+                break
+
+        headers = {"ETag": etag, "Cache-Control": entry.cache_control, "Last-Modified": entry.last_modified}
+        if entry.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+            return Response(status_code=304, headers=headers)
+        if body is not None:
+            return Response(body, media_type=entry.media_type, headers=headers)
+        return FileResponse(path, media_type=entry.media_type, headers=headers, stat_result=stat_result)
+
+
+def _route_path(scope: Scope) -> str:
+    """Path relative to where this app is mounted"""
+    path = scope["path"]
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        return path[len(root_path):]
+    return path
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def precompress(directory: str) -> int:
+    """Write .gz (and .br when brotli is installed) siblings for compressible files"""
+    written = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith((".gz", ".br")):
+                continue
+            path = os.path.join(root, filename)
+            media_type = mimetypes.guess_type(path)[0] or ""
+            if not media_type.startswith(COMPRESSIBLE_TYPES) or os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                continue
+            data = _read(path)
+            variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append((".br", brotli.compress(data, quality=11)))
+            for suffix, compressed in variants:
+                if len(compressed) < len(data):
+                    with open(path + suffix, "wb") as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join("..", "frontend", "dist")
+    print(f"Wrote {precompress(target)} compressed files under {target}")
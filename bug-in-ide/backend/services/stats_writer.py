@@ -0,0 +1,166 @@
+from typing import Dict, List, Optional, Sequence
+import logging
+import queue
+import threading
+import time
+
+import config
+from services.leaderboard import Leaderboard, StatRow, leaderboard
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# A failed leaderboard write is retried this many times, backing off from
+# WRITE_RETRY_DELAY seconds, before the batch is dropped
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.1
+
+# How long close() waits for the flusher to finish, in seconds
+CLOSE_TIMEOUT = 10.0
+
+
+class StatsWriter:
+    """Write-behind buffer between the stats endpoints and the leaderboard.
+
+    Requests only enqueue rows. A flusher thread, started on first use,
+    coalesces them into one leaderboard transaction per `flush_size` rows
+    or per `flush_interval` seconds, whichever comes first. SQLite writes
+    block, so they run on this thread rather than on the event loop or
+    the request threadpool. A write that keeps failing drops its batch
+    (logged and counted) rather than stopping the flusher.
+    """
+
+    def __init__(self, target: Leaderboard,
+                 flush_size: int = config.STATS_FLUSH_SIZE,
+                 flush_interval: float = config.STATS_FLUSH_INTERVAL,
+                 max_queue: int = config.STATS_MAX_QUEUE):
+        self.target = target
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+
+        # Metrics
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.batches_total = 0
+        self.rejected_total = 0
+        self.failed_batches_total = 0
+        self.dropped_total = 0
+        self.last_batch_size = 0
+        self.max_queue_depth = 0
+
+    def submit(self, rows: Sequence[StatRow]) -> int:
+        """Queue all of `rows` for the next flush, or none of them: raises queue.Full
+        when the buffer has no room for the whole batch"""
+        self._ensure_started()
+        with self._submit_lock:
+            # Only the flusher takes rows out, so the room checked here cannot shrink
+            if self._queue.qsize() + len(rows) > self.max_queue:
+                self.rejected_total += 1
+                raise queue.Full
+            for row in rows:
+                self._queue.put_nowait(row)
+            self.enqueued_total += len(rows)
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return len(rows)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()  # idle until something arrives
+            if first is _STOP:
+                return
+            batch: List[StatRow] = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stop = True
+                    break
+                batch.append(row)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[StatRow]) -> None:
+        delay = WRITE_RETRY_DELAY
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                self.target.add_rows(batch)
+                break
+            except Exception:
+                if attempt == WRITE_RETRIES:
+                    self.failed_batches_total += 1
+                    self.dropped_total += len(batch)
+                    logger.exception("event=stats_write_failed rows=%d attempts=%d", len(batch), attempt + 1)
+                    return
+                time.sleep(delay)
+                delay *= 2
+        self.flushed_total += len(batch)
+        self.batches_total += 1
+        self.last_batch_size = len(batch)
+
+    def close(self) -> None:
+        """Stop the flusher after writing everything still queued"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                # A full queue drains while the flusher runs; never wait on a dead one
+                self._queue.put(_STOP, timeout=CLOSE_TIMEOUT)
+            except queue.Full:
+                logger.error("event=stats_close_timeout queue_depth=%d", self._queue.qsize())
+            thread.join(CLOSE_TIMEOUT)
+            if thread.is_alive():
+                logger.error("event=stats_close_timeout queue_depth=%d", self._queue.qsize())
+                return  # still writing; leave the rest to it rather than race it
+        self._thread = None
+        # Anything submitted after the flusher stopped is written here
+        leftover: List[StatRow] = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                leftover.append(row)
+        if leftover:
+            self._write(leftover)
+
+    def stats(self) -> Dict:
+        """Queue depth and flush counters"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "batches_total": self.batches_total,
+            "rejected_total": self.rejected_total,
+            "failed_batches_total": self.failed_batches_total,
+            "dropped_total": self.dropped_total,
+            "last_batch_size": self.last_batch_size,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval
+        }
+
+
+# Global write-behind buffer for the leaderboard
+stats_writer = StatsWriter(leaderboard)